@@ -0,0 +1,261 @@
+import asyncio
+import base64
+import mimetypes
+import os
+import posixpath
+import threading
+from collections import OrderedDict
+from stat import S_ISREG
+from urllib.parse import unquote, urlparse
+
+import frappe
+from frappe.utils import cint
+
+FORBIDDEN = object()
+
+
+class AssetCache:
+    """Thread-safe LRU of hot asset bodies, bounded by total size
+
+    Entries hold the `version` of the file they were read at, its
+    modification time and size, a file replaced on disk is read afresh.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, path, version):
+        """Get (body, content_type) of `path` at `version`, or None"""
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(path)
+            return entry[1:]
+
+    def set(self, path, version, body, content_type):
+        # Don't let a single large asset flush the whole cache
+        if len(body) > self.max_size // 8:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(path, None)
+            if previous:
+                self.size -= len(previous[1])
+
+            self.entries[path] = (version, body, content_type)
+            self.size += len(body)
+
+            while self.size > self.max_size and self.entries:
+                _path, (_version, old_body, _type) = self.entries.popitem(
+                    last=False
+                )
+                self.size -= len(old_body)
+
+
+class AssetResolver:
+    """Serve same-site /assets and /files requests from disk during rendering
+
+    Chrome would otherwise fetch every stylesheet, font and image of the
+    print HTML over HTTP from the bench it is being rendered for. Only
+    requests for the site's hosts and paths are intercepted, the others go
+    to the network through Chrome's HTTP cache. `resolved` counts the
+    requests fulfilled from disk.
+    """
+
+    def __init__(
+        self,
+        hosts,
+        assets_path,
+        public_files_path,
+        private_files_path,
+        allow_private=True,
+    ):
+        self.hosts = hosts
+        self.assets_path = assets_path
+        self.public_files_path = public_files_path
+        self.private_files_path = private_files_path
+        self.allow_private = allow_private
+        self.resolved = 0
+
+    @classmethod
+    def for_site(cls, allow_private=True):
+        """Build a resolver for the current site and request
+
+        Private files need the session user's permissions, resolvers used
+        outside of a request thread must pass `allow_private=False`.
+        """
+        hosts = {urlparse(frappe.utils.get_url()).netloc}
+        if getattr(frappe.local, "request", None):
+            hosts.add(frappe.local.request.host)
+
+        return cls(
+            hosts,
+            os.path.join(frappe.local.sites_path, "assets"),
+            frappe.get_site_path("public", "files"),
+            frappe.get_site_path("private", "files"),
+            allow_private=allow_private,
+        )
+
+    def get_file_path(self, url):
+        """Get the path on disk of a same-site asset or file `url`, or None
+
+        Private files are mapped regardless of permissions, resolve checks
+        them before serving one.
+        """
+        parsed = urlparse(url)
+        if parsed.scheme not in ("http", "https") or parsed.netloc not in self.hosts:
+            return None
+
+        path = posixpath.normpath(unquote(parsed.path))
+        if ".." in path.split("/"):
+            return None
+
+        if path.startswith("/assets/"):
+            return os.path.join(self.assets_path, path[len("/assets/") :])
+        elif path.startswith("/files/"):
+            return os.path.join(self.public_files_path, path[len("/files/") :])
+        elif path.startswith("/private/files/") and self.allow_private:
+            return os.path.join(
+                self.private_files_path, path[len("/private/files/") :]
+            )
+
+    def resolve(self, url):
+        """Get (body, content_type) for `url`, FORBIDDEN, or None to pass it on"""
+        file_path = self.get_file_path(url)
+        if file_path is None:
+            return None
+
+        if file_path.startswith(self.private_files_path + os.sep):
+            path = posixpath.normpath(unquote(urlparse(url).path))
+            if not has_private_file_permission(path):
+                return FORBIDDEN
+
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        if not S_ISREG(stat.st_mode):
+            return None
+
+        # Files replaced under the same name are served afresh
+        version = (stat.st_mtime_ns, stat.st_size)
+        asset_cache = get_asset_cache()
+        cached = asset_cache.get(file_path, version)
+        if cached is not None:
+            return cached
+
+        with open(file_path, "rb") as f:
+            body = f.read()
+        content_type = (
+            mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+        )
+
+        asset_cache.set(file_path, version, body, content_type)
+        return body, content_type
+
+    def get_patterns(self):
+        """Get the CDP Fetch patterns of the requests resolve may serve"""
+        prefixes = ["/assets/", "/files/"]
+        if self.allow_private:
+            prefixes.append("/private/files/")
+        return [
+            {"urlPattern": f"*://{host}{prefix}*", "requestStage": "Request"}
+            for host in sorted(self.hosts)
+            for prefix in prefixes
+        ]
+
+    def attach(self, page):
+        """Start serving the same-site requests of a Playwright sync API page
+
+        Requests are paused through CDP Fetch for the URL patterns resolve
+        may serve only. page.route would disable Chrome's HTTP cache for
+        every request of the page, the warm cache among them. Returns the CDP
+        session to pass to detach once the render is done.
+        """
+        session = page.context.new_cdp_session(page)
+        session.on(
+            "Fetch.requestPaused",
+            lambda params: session.send(*self.handle_request(params)),
+        )
+        session.send("Fetch.enable", {"patterns": self.get_patterns()})
+        return session
+
+    def detach(self, session):
+        session.send("Fetch.disable")
+        session.detach()
+
+    async def attach_async(self, page):
+        """attach for a page of the Playwright async API
+
+        Files are read on the default executor, so the event loop keeps
+        serving other renders meanwhile.
+        """
+        session = await page.context.new_cdp_session(page)
+
+        async def on_request_paused(params):
+            command = await asyncio.get_running_loop().run_in_executor(
+                None, self.handle_request, params
+            )
+            await session.send(*command)
+
+        session.on("Fetch.requestPaused", on_request_paused)
+        await session.send("Fetch.enable", {"patterns": self.get_patterns()})
+        return session
+
+    async def detach_async(self, session):
+        await session.send("Fetch.disable")
+        await session.detach()
+
+    def handle_request(self, params):
+        """Get the CDP command answering a Fetch.requestPaused event"""
+        request_id = params["requestId"]
+        try:
+            result = self.resolve(params["request"]["url"])
+        except Exception:
+            result = None
+
+        if result is None:
+            return "Fetch.continueRequest", {"requestId": request_id}
+        if result is FORBIDDEN:
+            return "Fetch.fulfillRequest", {
+                "requestId": request_id,
+                "responseCode": 403,
+            }
+
+        body, content_type = result
+        self.resolved += 1
+        return "Fetch.fulfillRequest", {
+            "requestId": request_id,
+            "responseCode": 200,
+            "responseHeaders": [{"name": "Content-Type", "value": content_type}],
+            "body": base64.b64encode(body).decode(),
+        }
+
+
+def has_private_file_permission(file_url):
+    """Check if the session user may read the private file at `file_url`"""
+    file_name = frappe.db.get_value("File", {"file_url": file_url}, "name")
+    if not file_name:
+        return False
+    return frappe.get_doc("File", file_name).is_downloadable()
+
+
+def is_asset_interception_enabled():
+    return cint(frappe.conf.get("chrome_intercept_assets", 1))
+
+
+# Global asset cache shared by all render threads of this worker
+_asset_cache = None
+
+
+def get_asset_cache():
+    """Get singleton asset cache"""
+    global _asset_cache
+    if _asset_cache is None:
+        max_size = cint(frappe.conf.get("chrome_asset_cache_mb", 64)) << 20
+        _asset_cache = AssetCache(max_size)
+    return _asset_cache
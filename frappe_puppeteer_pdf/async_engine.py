@@ -0,0 +1,319 @@
+import asyncio
+import threading
+
+import frappe
+from frappe.utils import cint
+from playwright.async_api import async_playwright
+
+from .header_footer import apply_header_footer, extract_header_footer_async
+from .pdf_stream import PDFBuffer, stream_pdf_async
+from .render_metrics import RenderMetrics, is_render_metrics_enabled
+from .render_readiness import set_content_and_wait_async
+from .render_session import RESET_PAGE_SCRIPT, PooledPage
+from .warm_cache import AssetStats
+
+
+class AsyncRenderEngine:
+    """Render many PDFs concurrently over one CDP connection to Chrome
+
+    An asyncio event loop runs the Playwright async API on a background
+    thread. Renders can be submitted from any thread and run on pages of
+    their own, up to `concurrency` at a time, so a single worker keeps
+    several Chrome renderer processes busy with one driver and connection.
+
+    The loop thread has no Frappe context, everything site specific (PDF
+    options, asset resolver, chunk size) is resolved by the submitting thread.
+    """
+
+    def __init__(
+        self, chrome_manager, concurrency=8, max_uses=50, track_assets=False
+    ):
+        self.chrome_manager = chrome_manager
+        self.concurrency = max(int(concurrency), 1)
+        self.max_uses = max(int(max_uses), 1)
+        self.track_assets = track_assets
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+        # Only used on the loop thread
+        self.playwright = None
+        self.browser = None
+        self.chrome_pid = None
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+        self.connect_lock = asyncio.Lock()
+        self.idle = []
+
+    def start(self):
+        """Start the event loop thread if it is not running yet"""
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+
+            self.loop = asyncio.new_event_loop()
+            self.thread = threading.Thread(
+                target=self.run_loop,
+                name=f"chrome-pdf-engine-{self.chrome_manager.port}",
+                daemon=True,
+            )
+            self.thread.start()
+
+    def run_loop(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def submit(
+        self,
+        html,
+        pdf_options,
+        readiness="networkidle",
+        render_timeout=30000,
+        resolver=None,
+        output=None,
+        chunk_size=0,
+        metrics=None,
+        intercept_assets=True,
+        header_footer=False,
+        base_url=None,
+    ):
+        """Queue a render from any thread, returns a concurrent.futures.Future
+
+        The future resolves to the PDF bytes, or to `output` once the PDF was
+        written to it. PDFs are streamed out of Chrome when `chunk_size` is set.
+        `resolver` serves assets with `intercept_assets` and inlines header
+        and footer images with `header_footer`.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.render(
+                html,
+                pdf_options,
+                readiness,
+                render_timeout,
+                resolver if intercept_assets else None,
+                output,
+                chunk_size,
+                metrics or RenderMetrics(),
+                (resolver, base_url) if header_footer else None,
+            ),
+            self.loop,
+        )
+
+    async def render(
+        self,
+        html,
+        pdf_options,
+        readiness,
+        render_timeout,
+        resolver,
+        output,
+        chunk_size,
+        metrics,
+        header_footer,
+    ):
+        async with self.semaphore:
+            with metrics.stage("checkout"):
+                pooled = await self.acquire_page()
+            page = pooled.page
+
+            discard = True
+            try:
+                interception = None
+                if resolver:
+                    interception = await resolver.attach_async(page)
+                try:
+                    await set_content_and_wait_async(
+                        page, html, readiness, render_timeout, metrics=metrics
+                    )
+                    if header_footer:
+                        with metrics.stage("header_footer"):
+                            pdf_options = await self.add_header_footer(
+                                page, pdf_options, *header_footer
+                            )
+                    with metrics.stage("pdf"):
+                        pdf_data = await self.print_pdf(
+                            page, pdf_options, output, chunk_size
+                        )
+                    if pooled.assets:
+                        metrics.set_assets(
+                            pooled.assets.get_report(
+                                resolver.resolved if resolver else 0
+                            )
+                        )
+                finally:
+                    if interception:
+                        await resolver.detach_async(interception)
+                discard = False
+                return pdf_data
+            finally:
+                await self.release_page(pooled, discard)
+
+    async def add_header_footer(self, page, pdf_options, resolver, base_url):
+        sections = await extract_header_footer_async(page, pdf_options)
+        # Header and footer images are read from disk, keep the loop free
+        return await asyncio.get_running_loop().run_in_executor(
+            None, apply_header_footer, pdf_options, sections, resolver, base_url
+        )
+
+    async def print_pdf(self, page, pdf_options, output, chunk_size):
+        if not chunk_size:
+            pdf_data = await page.pdf(**pdf_options)
+            if output:
+                with open(output, "wb") as f:
+                    f.write(pdf_data)
+                return output
+            return pdf_data
+
+        if output:
+            with open(output, "wb") as f:
+                await stream_pdf_async(page, pdf_options, f, chunk_size)
+            return output
+
+        buffer = PDFBuffer()
+        await stream_pdf_async(page, pdf_options, buffer, chunk_size)
+        return bytes(buffer)
+
+    async def get_browser(self):
+        """Get a connected Browser, reconnecting if Chrome was restarted"""
+        async with self.connect_lock:
+            if (
+                self.browser
+                and self.browser.is_connected()
+                and self.chrome_pid == self.chrome_manager.pid
+            ):
+                return self.browser
+
+            await self.disconnect()
+            if self.playwright is None:
+                self.playwright = await async_playwright().start()
+
+            self.browser = await self.playwright.chromium.connect_over_cdp(
+                self.chrome_manager.get_connection_url()
+            )
+            self.chrome_pid = self.chrome_manager.pid
+            return self.browser
+
+    async def acquire_page(self):
+        """Check out an idle page of the current connection or open a new one"""
+        browser = await self.get_browser()
+        while self.idle:
+            pooled = self.idle.pop()
+            if pooled.page.context.browser is browser and not pooled.page.is_closed():
+                pooled.uses += 1
+                if pooled.assets:
+                    pooled.assets.reset()
+                return pooled
+
+        # The default context shares Chrome's profile (and its disk cache)
+        context = (
+            browser.contexts[0] if browser.contexts else await browser.new_context()
+        )
+        page = await context.new_page()
+        await page.emulate_media(media="print")
+
+        assets = None
+        if self.track_assets:
+            assets = AssetStats()
+            await assets.attach_async(page)
+        pooled = PooledPage(page, assets)
+        pooled.uses += 1
+        return pooled
+
+    async def release_page(self, pooled, discard=False):
+        """Reset and keep a page for the next render, or close it"""
+        if (
+            discard
+            or pooled.uses >= self.max_uses
+            or len(self.idle) >= self.concurrency
+            or not (self.browser and self.browser.is_connected())
+        ):
+            await self.close_page(pooled)
+            return
+
+        try:
+            await pooled.page.evaluate(RESET_PAGE_SCRIPT)
+            await pooled.page.goto("about:blank")
+        except Exception:
+            await self.close_page(pooled)
+            return
+
+        self.idle.append(pooled)
+
+    async def close_page(self, pooled):
+        try:
+            await pooled.page.close()
+        except Exception:
+            pass
+
+    async def disconnect(self):
+        while self.idle:
+            await self.close_page(self.idle.pop())
+        if self.browser:
+            try:
+                await self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.chrome_pid = None
+
+    async def close(self):
+        await self.disconnect()
+        if self.playwright:
+            try:
+                await self.playwright.stop()
+            except Exception:
+                pass
+        self.playwright = None
+
+    def stop(self, timeout=10):
+        """Close the connection and stop the loop thread"""
+        with self.lock:
+            if not (self.thread and self.thread.is_alive()):
+                return
+
+            try:
+                asyncio.run_coroutine_threadsafe(self.close(), self.loop).result(
+                    timeout
+                )
+            except Exception:
+                pass
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join(timeout)
+            self.thread = None
+
+
+# Engines of this process by Chrome debug port
+_async_engines = {}
+_async_engines_lock = threading.Lock()
+
+
+def get_async_engine(chrome_manager):
+    """Get the engine of this process for `chrome_manager`'s instance"""
+    with _async_engines_lock:
+        engine = _async_engines.get(chrome_manager.port)
+        if engine is None:
+            engine = _async_engines[chrome_manager.port] = AsyncRenderEngine(
+                chrome_manager,
+                concurrency=cint(frappe.conf.get("chrome_async_concurrency", 8)),
+                max_uses=cint(frappe.conf.get("chrome_page_max_uses", 50)),
+                track_assets=is_render_metrics_enabled(),
+            )
+        else:
+            # The caller made sure this one is running, it may have been
+            # restarted since the engine was created
+            engine.chrome_manager = chrome_manager
+        return engine
+
+
+def stop_async_engines():
+    """Stop all engines of this process"""
+    with _async_engines_lock:
+        engines = list(_async_engines.values())
+        _async_engines.clear()
+
+    for engine in engines:
+        engine.stop()
+
+
+def is_async_engine_enabled():
+    return cint(frappe.conf.get("chrome_async_engine", 0))
@@ -0,0 +1,233 @@
+import os
+import tempfile
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from .pdf_generator import get_pdf
+
+
+def is_background_pdf_enabled():
+    return cint(frappe.conf.get("chrome_background_pdf", 0))
+
+
+def should_render_in_background(html=None, documents=1):
+    """Check if a render is large enough to be moved to a background job"""
+    if not is_background_pdf_enabled():
+        return False
+
+    html_threshold = cint(frappe.conf.get("chrome_background_html_kb", 1024)) << 10
+    if html is not None and html_threshold and len(html) >= html_threshold:
+        return True
+
+    documents_threshold = cint(frappe.conf.get("chrome_background_documents", 50))
+    return bool(documents_threshold) and documents >= documents_threshold
+
+
+@frappe.whitelist()
+def download_pdf(doctype, name, format=None, no_letterhead=0, letterhead=None):
+    """Download a Chrome PDF, or queue it when it exceeds the background threshold"""
+    from .bulk_pdf import get_print_settings_options
+
+    frappe.has_permission(doctype, "print", doc=name, throw=True)
+
+    html = frappe.get_print(
+        doctype, name, format, no_letterhead=no_letterhead, letterhead=letterhead
+    )
+
+    if should_render_in_background(html):
+        return enqueue_pdf(
+            doctype, [name], format, no_letterhead=no_letterhead, letterhead=letterhead
+        )
+
+    fd, output = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+
+    try:
+        # Stream the PDF to disk and from there to the client
+        get_pdf(format, html, get_print_settings_options(), output, "chrome")
+        f = open(output, "rb")
+    finally:
+        os.remove(output)
+
+    response = Response(
+        wrap_file(frappe.local.request.environ, f),
+        mimetype="application/pdf",
+        direct_passthrough=True,
+    )
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{name.replace(" ", "-").replace("/", "-")}.pdf"'
+    )
+    return response
+
+
+@frappe.whitelist(allow_guest=True)
+def download_pdf_override(
+    doctype,
+    name,
+    format=None,
+    doc=None,
+    no_letterhead=0,
+    language=None,
+    letterhead=None,
+    **kwargs,
+):
+    """Override of Frappe's download_pdf, the Print view's PDF button
+
+    Large Chrome renders are queued like with download_pdf. Other prints,
+    of unsaved documents or by guests are handed to Frappe unchanged.
+    """
+    from frappe.translate import print_language
+    from frappe.utils.print_format import download_pdf as frappe_download_pdf
+
+    from .bulk_pdf import get_print_settings_options
+
+    pdf_generator = kwargs.get("pdf_generator") or frappe.form_dict.get(
+        "pdf_generator"
+    )
+    # Every form_dict key is passed in, cmd and cache busters among them,
+    # hand on only the ones Frappe's download_pdf accepts
+    kwargs = frappe.get_newargs(frappe_download_pdf, kwargs)
+    if (
+        doc
+        or pdf_generator != "chrome"
+        or frappe.session.user == "Guest"
+        or not is_background_pdf_enabled()
+    ):
+        return frappe_download_pdf(
+            doctype,
+            name,
+            format,
+            doc=doc,
+            no_letterhead=no_letterhead,
+            language=language,
+            letterhead=letterhead,
+            **kwargs,
+        )
+
+    frappe.has_permission(doctype, "print", doc=name, throw=True)
+
+    with print_language(language):
+        html = frappe.get_print(
+            doctype, name, format, no_letterhead=no_letterhead, letterhead=letterhead
+        )
+
+        if should_render_in_background(html):
+            enqueue_pdf(
+                doctype,
+                [name],
+                format,
+                no_letterhead=no_letterhead,
+                letterhead=letterhead,
+            )
+            # Opened in a new tab, show a page instead of the job as JSON
+            frappe.respond_as_web_page(
+                _("Generating PDF"),
+                _(
+                    "The PDF is being generated in the background, "
+                    "you will be notified when it is ready."
+                ),
+                indicator_color="blue",
+            )
+            return
+
+        pdf = get_pdf(format, html, get_print_settings_options(), None, "chrome")
+
+    frappe.local.response.filename = (
+        f"{name.replace(' ', '-').replace('/', '-')}.pdf"
+    )
+    frappe.local.response.filecontent = pdf
+    frappe.local.response.type = "pdf"
+
+
+def enqueue_pdf(doctype, names, print_format=None, no_letterhead=0, letterhead=None):
+    """Queue rendering of `names` into a private File"""
+    job = frappe.enqueue(
+        "frappe_puppeteer_pdf.background_pdf.generate_pdf_file",
+        queue="long",
+        timeout=cint(frappe.conf.get("chrome_background_timeout", 3600)),
+        doctype=doctype,
+        names=names,
+        print_format=print_format,
+        no_letterhead=no_letterhead,
+        letterhead=letterhead,
+        user=frappe.session.user,
+    )
+
+    frappe.msgprint(
+        _(
+            "The PDF is being generated in the background, "
+            "you will be notified when it is ready."
+        ),
+        alert=True,
+    )
+    return {"queued": 1, "job_id": job.id if job else None}
+
+
+def generate_pdf_file(
+    doctype, names, print_format=None, no_letterhead=0, letterhead=None, user=None
+):
+    """Background job: render documents with Chrome and store the PDF as a File"""
+    from .bulk_pdf import render_bulk_pdf
+
+    if user:
+        frappe.set_user(user)
+
+    fd, output = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+
+    try:
+        render_bulk_pdf(
+            doctype,
+            names,
+            output,
+            print_format=print_format,
+            no_letterhead=no_letterhead,
+            letterhead=letterhead,
+        )
+
+        with open(output, "rb") as f:
+            content = f.read()
+
+        single = len(names) == 1
+        file_name = (
+            names[0] if single else f"{doctype}-{frappe.generate_hash(length=8)}"
+        )
+        file_doc = frappe.get_doc(
+            {
+                "doctype": "File",
+                "file_name": f"{file_name.replace('/', '-')}.pdf",
+                "attached_to_doctype": doctype if single else None,
+                "attached_to_name": names[0] if single else None,
+                "is_private": 1,
+                "content": content,
+            }
+        ).insert(ignore_permissions=True)
+        frappe.db.commit()
+
+        frappe.publish_realtime(
+            "chrome_pdf_ready",
+            {
+                "doctype": doctype,
+                "names": names,
+                "file_url": file_doc.file_url,
+                "file_name": file_doc.file_name,
+            },
+            user=frappe.session.user,
+        )
+    except Exception as e:
+        frappe.log_error(
+            f"Background Chrome PDF generation failed for {doctype}: {e}"
+        )
+        frappe.publish_realtime(
+            "chrome_pdf_failed",
+            {"doctype": doctype, "names": names, "error": str(e)},
+            user=frappe.session.user,
+        )
+        raise
+    finally:
+        if os.path.exists(output):
+            os.remove(output)
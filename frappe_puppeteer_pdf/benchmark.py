@@ -0,0 +1,435 @@
+import base64
+import hashlib
+import json
+import math
+import os
+import platform
+import shutil
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+from io import BytesIO
+
+import frappe
+import psutil
+import requests
+
+from .chrome_manager import ChromeManager
+from .pdf_generator import generate_with_playwright, map_frappe_to_playwright
+from .render_metrics import count_pdf_pages
+from .render_session import close_render_session
+
+# Fixed options so runs stay comparable, they go through map_frappe_to_playwright
+# like any other print
+BENCHMARK_OPTIONS = {
+    "page_size": "A4",
+    "margin_top": 15,
+    "margin_bottom": 15,
+    "margin_left": 15,
+    "margin_right": 15,
+}
+
+BENCHMARK_STYLE = """
+body { font-family: sans-serif; font-size: 10pt; margin: 0; }
+table { width: 100%; border-collapse: collapse; }
+th, td { border: 1px solid #ccc; padding: 2px 4px; text-align: left; }
+.page { page-break-after: always; }
+.page:last-child { page-break-after: auto; }
+.images img { width: 30%; margin: 1%; }
+.barcodes div { display: inline-block; width: 30%; margin: 1%; }
+.wide td, .wide th { font-size: 7pt; white-space: nowrap; }
+"""
+
+ROWS_PER_PAGE = 30
+
+
+def make_document(body, landscape=False):
+    page_rule = "@page { size: A4 landscape; }" if landscape else ""
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<style>{BENCHMARK_STYLE}{page_rule}</style></head>"
+        f"<body>{body}</body></html>"
+    )
+
+
+def make_pages_html(pages):
+    """Invoice-like document with one table of items per page"""
+    body = []
+    for page in range(pages):
+        rows = "".join(
+            f"<tr><td>{page * ROWS_PER_PAGE + row + 1}</td>"
+            f"<td>Item {page:04d}-{row:02d}</td><td>Description of item {row}</td>"
+            f"<td>{row + 1}</td><td>{(row + 1) * 12.5:.2f}</td></tr>"
+            for row in range(ROWS_PER_PAGE)
+        )
+        body.append(
+            f"<div class='page'><h2>Invoice INV-{page:05d}</h2>"
+            "<table><thead><tr><th>#</th><th>Item</th><th>Description</th>"
+            f"<th>Qty</th><th>Amount</th></tr></thead><tbody>{rows}</tbody></table>"
+            "</div>"
+        )
+    return make_document("".join(body))
+
+
+def make_png(seed, size=160):
+    """Deterministic gradient PNG as base64"""
+    import png
+
+    rows = [
+        [
+            value
+            for x in range(size)
+            for value in ((x + seed * 7) % 256, (y + seed * 13) % 256, seed * 29 % 256)
+        ]
+        for y in range(size)
+    ]
+    buffer = BytesIO()
+    png.Writer(size, size, greyscale=False).write(buffer, rows)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def make_images_html(pages=10, per_page=6):
+    """Pages of distinct inline PNG images"""
+    body = []
+    for page in range(pages):
+        images = "".join(
+            f"<img src='data:image/png;base64,{make_png(page * per_page + i)}'>"
+            for i in range(per_page)
+        )
+        body.append(f"<div class='page images'><h2>Gallery {page}</h2>{images}</div>")
+    return make_document("".join(body))
+
+
+def make_barcodes_html(pages=10, per_page=24):
+    """Pages of Code 128 barcodes and QR codes rendered as SVG"""
+    from .pdf_utils import get_barcode
+
+    body = []
+    for page in range(pages):
+        codes = []
+        for i in range(per_page):
+            value = f"BENCH-{page:03d}-{i:03d}"
+            barcode_format = "qrcode" if i % 2 else "code128"
+            codes.append(f"<div>{get_barcode(barcode_format, value)['value']}</div>")
+        body.append(
+            f"<div class='page barcodes'><h2>Labels {page}</h2>{''.join(codes)}</div>"
+        )
+    return make_document("".join(body))
+
+
+def make_wide_table_html(rows=500, columns=40):
+    """One long table with many columns, printed in landscape"""
+    head = "".join(f"<th>Column {column}</th>" for column in range(columns))
+    body = "".join(
+        "<tr>"
+        + "".join(f"<td>{row * columns + column}</td>" for column in range(columns))
+        + "</tr>"
+        for row in range(rows)
+    )
+    table = f"<thead><tr>{head}</tr></thead><tbody>{body}</tbody>"
+    return make_document(f"<table class='wide'>{table}</table>", landscape=True)
+
+
+CORPUS = {
+    "pages_1": lambda: make_pages_html(1),
+    "pages_10": lambda: make_pages_html(10),
+    "pages_100": lambda: make_pages_html(100),
+    "pages_1000": lambda: make_pages_html(1000),
+    "images": make_images_html,
+    "barcodes": make_barcodes_html,
+    "wide_table": make_wide_table_html,
+}
+
+
+class RSSSampler:
+    """Track peak RSS of this worker, its Chrome and wkhtmltopdf process trees
+
+    Samples every `interval` seconds on a background thread. Of the other
+    child processes only wkhtmltopdf is counted, not the Playwright driver.
+    """
+
+    def __init__(self, chrome_pid, interval=0.05):
+        self.chrome_pid = chrome_pid
+        self.interval = interval
+        self.peak = {}
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        self.peak = {"worker": 0, "chrome": 0, "wkhtmltopdf": 0}
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.stopped.set()
+        self.thread.join()
+        self.sample()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        worker = psutil.Process()
+        usage = {"worker": get_rss(worker), "chrome": 0, "wkhtmltopdf": 0}
+
+        chrome_pids = set()
+        try:
+            chrome = psutil.Process(self.chrome_pid)
+            tree = [chrome, *chrome.children(recursive=True)]
+            chrome_pids = {process.pid for process in tree}
+            usage["chrome"] = sum(get_rss(process) for process in tree)
+        except psutil.Error:
+            pass
+
+        for process in worker.children(recursive=True):
+            if process.pid not in chrome_pids and is_wkhtmltopdf_process(process):
+                usage["wkhtmltopdf"] += get_rss(process)
+
+        for name, rss in usage.items():
+            self.peak[name] = max(self.peak[name], rss)
+
+
+def is_wkhtmltopdf_process(process):
+    try:
+        return process.name().startswith("wkhtmltopdf")
+    except psutil.Error:
+        return False
+
+
+def get_rss(process):
+    try:
+        return process.memory_info().rss
+    except psutil.Error:
+        return 0
+
+
+class PDFBenchmark:
+    """Render a synthetic corpus with Chrome and wkhtmltopdf and time it
+
+    Chrome is a fresh instance of the locally installed headless_shell on a
+    free port with a throwaway profile, so results don't depend on the state
+    of the Chrome pool serving the site.
+    """
+
+    def __init__(self, cases=None, iterations=5, warmup=1, wkhtmltopdf=True):
+        self.cases = cases or list(CORPUS)
+        self.iterations = iterations
+        self.warmup = warmup
+        self.wkhtmltopdf = wkhtmltopdf
+        self.chrome_manager = None
+        self.user_data_dir = None
+
+    def run(self):
+        unknown = set(self.cases) - set(CORPUS)
+        if unknown:
+            frappe.throw(f"Unknown benchmark cases: {', '.join(sorted(unknown))}")
+        # Timings and the PDF measured come from the timed renders
+        if self.iterations < 1:
+            frappe.throw(
+                f"Benchmark iterations must be at least 1, got {self.iterations}"
+            )
+
+        self.start_chrome()
+        try:
+            results = {
+                "environment": self.get_environment(),
+                "options": {
+                    "iterations": self.iterations,
+                    "warmup": self.warmup,
+                    "pdf_options": map_frappe_to_playwright(dict(BENCHMARK_OPTIONS)),
+                },
+                "cases": {},
+            }
+            for case in self.cases:
+                results["cases"][case] = self.run_case(case)
+            return results
+        finally:
+            self.stop_chrome()
+
+    def run_case(self, case):
+        html = CORPUS[case]()
+        result = {
+            "html_bytes": len(html.encode("utf-8")),
+            # Changes when the corpus changes, results are only comparable
+            # for equal digests
+            "html_digest": hashlib.sha1(html.encode("utf-8")).hexdigest()[:12],
+            "chrome": self.measure(self.render_chrome, html),
+        }
+
+        if self.wkhtmltopdf:
+            result["wkhtmltopdf"] = self.measure(self.render_wkhtmltopdf, html)
+            result["comparison"] = compare(result["chrome"], result["wkhtmltopdf"])
+
+        return result
+
+    def measure(self, render, html):
+        """Time `iterations` renders after `warmup` untimed ones"""
+        try:
+            for _i in range(self.warmup):
+                render(html)
+
+            durations = []
+            with RSSSampler(self.chrome_manager.pid) as sampler:
+                for _i in range(self.iterations):
+                    started_at = time.perf_counter()
+                    pdf_data = render(html)
+                    durations.append(time.perf_counter() - started_at)
+        except Exception as e:
+            return {"error": str(e)}
+
+        pages = count_pdf_pages(pdf_data)
+        total = sum(durations)
+        return {
+            "latency_ms": get_percentiles(durations),
+            "throughput": {
+                "documents_per_s": round(len(durations) / total, 3),
+                "pages_per_s": round(pages * len(durations) / total, 3),
+            },
+            "pdf_bytes": len(pdf_data),
+            "pages": pages,
+            "peak_rss_mb": {
+                name: round(rss / (1 << 20), 1) for name, rss in sampler.peak.items()
+            },
+        }
+
+    def render_chrome(self, html):
+        return generate_with_playwright(
+            html, dict(BENCHMARK_OPTIONS), self.chrome_manager, readiness="load"
+        )
+
+    def render_wkhtmltopdf(self, html):
+        from frappe.utils.pdf import get_pdf
+
+        return get_pdf(html, dict(BENCHMARK_OPTIONS))
+
+    def start_chrome(self):
+        self.user_data_dir = tempfile.mkdtemp(prefix="pdf-benchmark-")
+        self.chrome_manager = ChromeManager(
+            port=get_free_port(), user_data_dir=self.user_data_dir
+        )
+        self.chrome_manager.start()
+
+    def stop_chrome(self):
+        close_render_session()
+        if self.chrome_manager:
+            self.chrome_manager.stop()
+        if self.user_data_dir:
+            shutil.rmtree(self.user_data_dir, ignore_errors=True)
+
+    def get_environment(self):
+        from importlib.metadata import version
+
+        environment = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "frappe": frappe.__version__,
+            "playwright": version("playwright"),
+            "chrome_executable": self.chrome_manager.executable_path,
+        }
+
+        try:
+            response = requests.get(
+                f"{self.chrome_manager.get_connection_url()}/json/version", timeout=5
+            )
+            environment["chrome"] = response.json().get("Browser")
+        except (requests.RequestException, ValueError):
+            environment["chrome"] = None
+
+        if self.wkhtmltopdf:
+            from frappe.utils.pdf import get_wkhtmltopdf_version
+
+            environment["wkhtmltopdf"] = get_wkhtmltopdf_version()
+
+        return environment
+
+
+def get_percentiles(durations):
+    """Latency summary in ms, percentiles by nearest rank"""
+    ordered = sorted(durations)
+
+    def percentile(p):
+        index = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+        return round(ordered[index] * 1000, 2)
+
+    return {
+        "min": round(ordered[0] * 1000, 2),
+        "p50": percentile(50),
+        "p90": percentile(90),
+        "p95": percentile(95),
+        "p99": percentile(99),
+        "max": round(ordered[-1] * 1000, 2),
+        "mean": round(statistics.mean(ordered) * 1000, 2),
+        "stdev": round(statistics.pstdev(ordered) * 1000, 2),
+    }
+
+
+def compare(chrome, wkhtmltopdf):
+    """Ratios of wkhtmltopdf to Chrome, above 1 means Chrome is ahead"""
+    if "error" in chrome or "error" in wkhtmltopdf:
+        return None
+
+    def ratio(a, b):
+        return round(a / b, 3) if b else None
+
+    return {
+        "p50_latency_ratio": ratio(
+            wkhtmltopdf["latency_ms"]["p50"], chrome["latency_ms"]["p50"]
+        ),
+        "p95_latency_ratio": ratio(
+            wkhtmltopdf["latency_ms"]["p95"], chrome["latency_ms"]["p95"]
+        ),
+        "pdf_size_ratio": ratio(wkhtmltopdf["pdf_bytes"], chrome["pdf_bytes"]),
+    }
+
+
+def get_free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def format_summary(results):
+    """Plain text table of the main numbers"""
+    lines = [
+        f"{'case':<12} {'engine':<12} {'p50 ms':>10} {'p95 ms':>10} "
+        f"{'pages/s':>10} {'pages':>6} {'chrome MB':>10} {'worker MB':>10}"
+    ]
+    for case, result in results["cases"].items():
+        for engine in ("chrome", "wkhtmltopdf"):
+            stats = result.get(engine)
+            if stats is None:
+                continue
+            if "error" in stats:
+                lines.append(f"{case:<12} {engine:<12} error: {stats['error']}")
+                continue
+            lines.append(
+                f"{case:<12} {engine:<12} {stats['latency_ms']['p50']:>10} "
+                f"{stats['latency_ms']['p95']:>10} "
+                f"{stats['throughput']['pages_per_s']:>10} {stats['pages']:>6} "
+                f"{stats['peak_rss_mb']['chrome']:>10} "
+                f"{stats['peak_rss_mb']['worker']:>10}"
+            )
+    return "\n".join(lines)
+
+
+def run_benchmark(cases=None, iterations=5, warmup=1, wkhtmltopdf=True, output=None):
+    """Run the benchmark and write JSON results to `output` if given"""
+    results = PDFBenchmark(
+        cases=cases, iterations=iterations, warmup=warmup, wkhtmltopdf=wkhtmltopdf
+    ).run()
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    return results
@@ -0,0 +1,293 @@
+import os
+import queue
+import tempfile
+import threading
+from io import BytesIO
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+from pypdf import PdfReader, PdfWriter
+from werkzeug.wrappers import Response
+from werkzeug.wsgi import wrap_file
+
+from .async_engine import is_async_engine_enabled
+from .chrome_pool import get_chrome_pool
+from .circuit_breaker import get_circuit_breaker
+from .header_footer import is_native_header_footer
+from .pdf_generator import (
+    fallback_to_wkhtmltopdf,
+    generate_with_engine,
+    generate_with_playwright,
+    get_pdf_options,
+    prepare_html,
+)
+from .render_metrics import RenderMetrics
+from .render_profile import get_render_profile
+from .render_readiness import get_render_readiness
+from .render_session import close_render_session
+
+
+@frappe.whitelist()
+def download_bulk_pdf(doctype, names, format=None, no_letterhead=0, letterhead=None):
+    """Render many documents with Chrome and download them as one PDF"""
+    from .background_pdf import enqueue_pdf, should_render_in_background
+
+    names = frappe.parse_json(names) if isinstance(names, str) else names
+
+    if should_render_in_background(documents=len(names)):
+        return enqueue_pdf(
+            doctype, names, format, no_letterhead=no_letterhead, letterhead=letterhead
+        )
+
+    fd, output = tempfile.mkstemp(suffix=".pdf")
+    os.close(fd)
+
+    try:
+        render_bulk_pdf(
+            doctype,
+            names,
+            output,
+            print_format=format,
+            no_letterhead=no_letterhead,
+            letterhead=letterhead,
+        )
+        f = open(output, "rb")
+    finally:
+        # The open handle keeps the merged file readable until it is streamed
+        os.remove(output)
+
+    response = Response(
+        wrap_file(frappe.local.request.environ, f),
+        mimetype="application/pdf",
+        direct_passthrough=True,
+    )
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{frappe.scrub(doctype)}.pdf"'
+    )
+    return response
+
+
+def render_bulk_pdf(
+    doctype,
+    names,
+    output,
+    print_format=None,
+    no_letterhead=0,
+    letterhead=None,
+    progress_callback=None,
+):
+    """Render `names` concurrently over Chrome pages and merge them into `output`
+
+    HTML is built on this thread, which owns the database connection, while
+    render threads each hold their own pages on the pool's Chrome instances.
+    Finished PDFs are merged in document order as soon as they are ready.
+    """
+    for name in names:
+        frappe.has_permission(doctype, "print", doc=name, throw=True)
+
+    options = get_pdf_options(print_format, get_print_settings_options())
+    readiness = get_render_readiness(print_format)
+
+    breaker = get_circuit_breaker()
+    managers = [None]
+    if not breaker.is_open():
+        try:
+            managers = get_chrome_pool().get_managers()
+        except Exception as e:
+            frappe.log_error(f"Failed to start Chrome: {e}")
+            breaker.record_failure(e)
+
+    concurrency = max(
+        cint(frappe.conf.get("chrome_bulk_concurrency", 2 * len(managers))), 1
+    )
+    concurrency = min(concurrency, len(names)) or 1
+    # Seconds to wait for the next document, covers a render thread that died
+    timeout = cint(frappe.conf.get("chrome_bulk_document_timeout", 300)) or None
+
+    jobs = queue.Queue()
+    results = queue.Queue()
+    threads = [
+        threading.Thread(
+            target=render_worker,
+            args=(
+                frappe.local.site,
+                frappe.local.sites_path,
+                frappe.session.user,
+                managers[i % len(managers)],
+                print_format,
+                options,
+                readiness,
+                jobs,
+                results,
+            ),
+            daemon=True,
+        )
+        for i in range(concurrency)
+    ]
+    for thread in threads:
+        thread.start()
+
+    writer = PdfWriter()
+    pending = {}
+    merged = 0
+    pages = 0
+
+    def merge_next():
+        nonlocal merged, pages
+        while merged not in pending:
+            try:
+                index, pdf_data, error = results.get(timeout=timeout)
+            except queue.Empty:
+                raise frappe.ValidationError(
+                    _("Timed out waiting for document {0} of {1}").format(
+                        merged + 1, len(names)
+                    )
+                )
+            if error:
+                raise error
+            pending[index] = pdf_data
+
+        pdf_data = pending.pop(merged)
+        reader = PdfReader(pdf_data)
+        writer.append(reader)
+        pages += len(reader.pages)
+        merged += 1
+
+        if progress_callback:
+            progress_callback(merged, len(names), pages)
+        else:
+            frappe.publish_progress(
+                merged * 100 / len(names),
+                title=_("Generating PDF"),
+                description=_("{0} of {1} documents, {2} pages").format(
+                    merged, len(names), pages
+                ),
+            )
+
+    try:
+        for index, name in enumerate(names):
+            # Keep a bounded number of documents in flight
+            while index - merged >= 2 * concurrency:
+                merge_next()
+
+            html = frappe.get_print(
+                doctype,
+                name,
+                print_format,
+                no_letterhead=no_letterhead,
+                letterhead=letterhead,
+            )
+            # Style interning state lives on this thread's frappe.local
+            jobs.put((index, prepare_html(html, print_format)))
+
+        while merged < len(names):
+            merge_next()
+    finally:
+        # Drop documents that were not picked up yet if we are bailing out
+        while True:
+            try:
+                jobs.get_nowait()
+            except queue.Empty:
+                break
+        for _thread in threads:
+            jobs.put(None)
+        for thread in threads:
+            thread.join()
+
+    with open(output, "wb") as f:
+        writer.write(f)
+
+    return output
+
+
+def render_worker(
+    site,
+    sites_path,
+    user,
+    chrome_manager,
+    print_format,
+    options,
+    readiness,
+    jobs,
+    results,
+):
+    """Render queued HTML documents to PDF on this thread's Chrome pages
+
+    Documents go to the wkhtmltopdf fallback without a `chrome_manager` or
+    while the circuit breaker is open.
+    """
+    try:
+        frappe.init(site=site, sites_path=sites_path)
+        frappe.connect()
+        frappe.set_user(user)
+        breaker = get_circuit_breaker()
+        header_footer = is_native_header_footer(print_format)
+        # With the engine, render threads only wait on its shared connection
+        generate = (
+            generate_with_engine
+            if is_async_engine_enabled()
+            else generate_with_playwright
+        )
+    except Exception as e:
+        # Fail every document this thread picks up, so the merge doesn't wait
+        # for them
+        fail_jobs(jobs, results, e)
+        frappe.destroy()
+        return
+
+    try:
+        while True:
+            job = jobs.get()
+            if job is None:
+                break
+
+            index, html = job
+            metrics = RenderMetrics(print_format)
+            metrics.set_html(html)
+            try:
+                pdf_data = None
+                result = "circuit_open"
+                if chrome_manager and breaker.allow_request():
+                    try:
+                        pdf_data = generate(
+                            html,
+                            options,
+                            chrome_manager,
+                            readiness=readiness[0],
+                            render_timeout=readiness[1],
+                            metrics=metrics,
+                            header_footer=header_footer,
+                        )
+                        breaker.record_success()
+                        result = "chrome"
+                    except Exception as e:
+                        breaker.record_failure(e)
+                        result = "fallback"
+
+                if pdf_data is None:
+                    with metrics.stage("fallback"):
+                        pdf_data = fallback_to_wkhtmltopdf(html, options, None)
+                metrics.finish(result, pdf_data)
+                results.put((index, BytesIO(pdf_data), None))
+            except Exception as e:
+                results.put((index, None, e))
+    finally:
+        close_render_session()
+        # Keep the Error Logs of failed renders
+        frappe.db.commit()
+        frappe.destroy()
+
+
+def fail_jobs(jobs, results, error):
+    """Post `error` as the result of queued documents until the stop marker"""
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        results.put((job[0], None, error))
+
+
+def get_print_settings_options():
+    """Get PDF page size options from Print Settings"""
+    return dict(get_render_profile().print_settings_options)
@@ -4,23 +4,56 @@ import time
 from pathlib import Path
 
 import frappe
+import psutil
+import requests
+
+from .warm_cache import make_warm_page
 
 
 class ChromeManager:
-    """Manages Chrome process for Puppeteer PDF generation"""
+    """Manages Chrome process for Puppeteer PDF generation
+
+    :param port: remote debugging port of the instance
+    :param user_data_dir: profile directory, Chrome's default if not set
+    :param detached: launch Chrome in its own session and leave it running
+            when this manager goes away, so other workers can keep using it
+    :param slot: index of the instance in the Chrome pool
+    :param disk_cache_dir: directory of Chrome's HTTP cache, kept across restarts
+    :param disk_cache_size: size cap of the HTTP cache in bytes, Chrome's if 0
+    :param warm_urls: stylesheets, fonts and other assets to load into the
+            cache at start-up, needs `user_data_dir`
+    """
 
-    def __init__(self):
+    def __init__(
+        self,
+        port=9222,
+        user_data_dir=None,
+        detached=False,
+        slot=None,
+        disk_cache_dir=None,
+        disk_cache_size=0,
+        warm_urls=None,
+    ):
+        self.slot = slot
         self.process = None
-        self.port = 9222
+        self.pid = None
+        self.port = port
+        self.user_data_dir = user_data_dir
+        self.detached = detached
+        self.disk_cache_dir = disk_cache_dir
+        self.disk_cache_size = disk_cache_size
+        self.warm_urls = warm_urls or []
         self.executable_path = None
+        self.startup_time = None
 
     def start(self):
         """Start Chrome with remote debugging enabled"""
-        if self.process and self.process.poll() is None:
+        if self.is_running():
             frappe.logger().info("Chrome already running")
             return
 
-        self.executable_path = self.get_chrome_path()
+        if not self.executable_path:
+            self.executable_path = self.get_chrome_path()
 
         cmd = [
             self.executable_path,
@@ -41,32 +74,99 @@ class ChromeManager:
             "--disable-client-side-phishing-detection",
             "--disable-component-update",
             "--disable-domain-reliability",
-            "--disable-features=TranslateUI",
+            # Renders run on about:blank pages, whose opaque origin would
+            # otherwise get a cache partition of its own on every render
+            "--disable-features=TranslateUI,SplitCacheByNetworkIsolationKey",
             "--hide-scrollbars",
             "--mute-audio",
-            "about:blank",
         ]
 
+        if self.user_data_dir:
+            os.makedirs(self.user_data_dir, exist_ok=True)
+            cmd.append(f"--user-data-dir={self.user_data_dir}")
+
+        if self.disk_cache_dir:
+            os.makedirs(self.disk_cache_dir, exist_ok=True)
+            cmd.append(f"--disk-cache-dir={self.disk_cache_dir}")
+        if self.disk_cache_size:
+            cmd.append(f"--disk-cache-size={self.disk_cache_size}")
+
+        cmd.append(self.get_start_url())
+
         try:
             frappe.logger().info(f"Starting Chrome: {self.executable_path}")
+            started_at = time.monotonic()
             self.process = subprocess.Popen(
-                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=self.detached,
             )
+            self.pid = self.process.pid
 
-            # Wait for Chrome to start
-            time.sleep(3)
+            # Wait for the DevTools endpoint to accept connections
+            version = self.wait_until_ready()
+            self.startup_time = time.monotonic() - started_at
 
-            # Verify Chrome is running
-            if self.process.poll() is not None:
-                raise Exception("Chrome process failed to start")
-
-            frappe.logger().info(f"Chrome started on port {self.port}")
+            frappe.logger().info(
+                f"Chrome {version.get('Browser', '')} started on port {self.port} "
+                f"in {self.startup_time * 1000:.0f} ms"
+            )
 
         except Exception as e:
             frappe.log_error(f"Failed to start Chrome: {e}")
+            if self.process and self.process.poll() is None:
+                self.process.kill()
             self.process = None
+            self.pid = None
             raise
 
+    def get_start_url(self):
+        """Get the page Chrome opens with, the warm cache page if configured
+
+        The page keeps loading after Chrome accepted connections, renders
+        don't wait for it.
+        """
+        if not (self.warm_urls and self.user_data_dir):
+            return "about:blank"
+
+        warm_page = Path(self.user_data_dir, "warm-cache.html")
+        warm_page.write_text(make_warm_page(self.warm_urls))
+        return warm_page.as_uri()
+
+    def attach(self, pid):
+        """Use a Chrome instance launched by another worker"""
+        self.process = None
+        self.pid = pid
+
+    def wait_until_ready(self, timeout=None):
+        """Poll /json/version on the debug port until Chrome accepts connections"""
+        if timeout is None:
+            timeout = frappe.get_common_site_config().get("chrome_start_timeout", 10)
+
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+
+        while True:
+            if not self.is_running():
+                raise Exception("Chrome process failed to start")
+
+            try:
+                response = requests.get(
+                    f"{self.get_connection_url()}/json/version", timeout=1
+                )
+                if response.ok:
+                    return response.json()
+            except (requests.RequestException, ValueError):
+                pass
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Exception(f"Chrome did not accept connections within {timeout}s")
+
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
     def get_chrome_path(self):
         """Get Chrome executable path from install.py"""
         from .install import find_or_download_chromium_executable
@@ -92,25 +192,59 @@ class ChromeManager:
                 self.process.wait()
             finally:
                 self.process = None
+                self.pid = None
+        elif self.pid:
+            try:
+                frappe.logger().info(f"Stopping Chrome process {self.pid}")
+                process = psutil.Process(self.pid)
+                process.terminate()
+                process.wait(timeout=5)
+            except psutil.TimeoutExpired:
+                frappe.logger().warning(
+                    "Chrome did not terminate gracefully, forcing kill"
+                )
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
+            finally:
+                self.pid = None
 
     def is_running(self):
         """Check if Chrome process is running"""
-        return self.process and self.process.poll() is None
+        if self.process:
+            return self.process.poll() is None
+        return bool(self.pid) and is_chrome_process(self.pid, self.port)
 
     def __del__(self):
         """Ensure Chrome is stopped when object is destroyed"""
-        self.stop()
+        # Detached instances are shared with other workers, leave them running
+        if not self.detached:
+            self.stop()
+
 
+def is_chrome_process(pid, port):
+    """Check that `pid` is a live Chrome serving the debug `port`"""
+    try:
+        process = psutil.Process(pid)
+        if process.status() == psutil.STATUS_ZOMBIE:
+            return False
+        # Guard against the pid being reused by an unrelated process
+        return f"--remote-debugging-port={port}" in process.cmdline()
+    except (psutil.NoSuchProcess, psutil.AccessDenied):
+        return False
 
-# Global Chrome manager instance
+
+# Chrome manager for the instance leased by this worker
 _chrome_manager = None
 
 
 def get_chrome_manager():
-    """Get singleton Chrome manager instance"""
+    """Get Chrome manager for the pool instance leased by this worker"""
     global _chrome_manager
     if _chrome_manager is None:
-        _chrome_manager = ChromeManager()
+        from .chrome_pool import get_chrome_pool
+
+        _chrome_manager = get_chrome_pool().lease()
     return _chrome_manager
 
 
@@ -118,13 +252,21 @@ def ensure_chrome_running():
     """Ensure Chrome is running, start if not"""
     manager = get_chrome_manager()
     if not manager.is_running():
-        manager.start()
+        from .chrome_pool import get_chrome_pool
+
+        get_chrome_pool().start_instance(manager)
     return manager
 
 
 def stop_chrome():
     """Stop Chrome if running"""
+    from .async_engine import stop_async_engines
+    from .chrome_pool import get_chrome_pool
+    from .render_session import close_render_session
+
     global _chrome_manager
+    close_render_session()
+    stop_async_engines()
     if _chrome_manager:
-        _chrome_manager.stop()
+        get_chrome_pool().stop_instance(_chrome_manager)
         _chrome_manager = None
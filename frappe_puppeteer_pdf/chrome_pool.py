@@ -0,0 +1,272 @@
+import atexit
+import json
+import os
+import time
+
+import frappe
+import psutil
+from frappe.utils.synchronization import filelock
+
+from .chrome_manager import ChromeManager, is_chrome_process
+from .warm_cache import get_warm_urls
+
+POOL_LOCK = "frappe_puppeteer_pdf_chrome_pool"
+
+
+class ChromePool:
+    """Bench-wide pool of headless_shell instances shared by all workers
+
+    Every instance gets its own debug port and user-data-dir. Instances are
+    recorded in a JSON registry under `<bench>/chromium/pool` which is only
+    touched while holding a bench-wide file lock. Workers lease the least
+    used instance instead of launching their own Chrome, and launch it only
+    when nobody else has.
+    """
+
+    def __init__(self):
+        config = frappe.get_common_site_config()
+        self.size = max(int(config.get("chrome_pool_size", 1)), 1)
+        self.base_port = int(config.get("chrome_base_port", 9222))
+        self.pool_dir = os.path.join(frappe.utils.get_bench_path(), "chromium", "pool")
+        self.registry_path = os.path.join(self.pool_dir, "registry.json")
+        self.disk_cache_size = int(config.get("chrome_disk_cache_mb", 256)) << 20
+        self.start_timeout = int(config.get("chrome_start_timeout", 10))
+        # Slots this worker registered an exit-time release for
+        self.leased_slots = set()
+
+    def get_port(self, slot):
+        return self.base_port + slot
+
+    def get_user_data_dir(self, slot):
+        return os.path.join(self.pool_dir, f"profile-{slot}")
+
+    def get_disk_cache_dir(self, slot):
+        return os.path.join(self.pool_dir, f"cache-{slot}")
+
+    def read_registry(self):
+        """Read registry, must be called while holding the pool lock"""
+        try:
+            with open(self.registry_path) as f:
+                registry = json.load(f)
+        except (FileNotFoundError, ValueError):
+            registry = {}
+
+        registry.setdefault("instances", {})
+        return registry
+
+    def write_registry(self, registry):
+        """Write registry atomically, must be called while holding the pool lock"""
+        os.makedirs(self.pool_dir, exist_ok=True)
+        tmp_path = f"{self.registry_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f, indent=1)
+        os.replace(tmp_path, self.registry_path)
+
+    def get_instance(self, registry, slot):
+        """Get registry entry for `slot`, creating an empty one if missing"""
+        instance = registry["instances"].setdefault(str(slot), {})
+        instance.setdefault("port", self.get_port(slot))
+        instance.setdefault("user_data_dir", self.get_user_data_dir(slot))
+        instance.setdefault("pid", None)
+        instance.setdefault("leases", [])
+        return instance
+
+    def prune(self, registry):
+        """Drop leases held by workers that no longer exist"""
+        for slot in range(self.size):
+            instance = self.get_instance(registry, slot)
+            instance["leases"] = [
+                pid for pid in instance["leases"] if psutil.pid_exists(pid)
+            ]
+
+    def make_manager(self, slot, instance):
+        manager = ChromeManager(
+            port=instance["port"],
+            user_data_dir=instance["user_data_dir"],
+            detached=True,
+            slot=slot,
+            disk_cache_dir=self.get_disk_cache_dir(slot),
+            disk_cache_size=self.disk_cache_size,
+            warm_urls=get_warm_urls(),
+        )
+        if instance["pid"] and is_chrome_process(instance["pid"], instance["port"]):
+            manager.attach(instance["pid"])
+        return manager
+
+    def lease(self):
+        """Lease the least used instance for this worker"""
+        with filelock(POOL_LOCK, is_global=True):
+            registry = self.read_registry()
+            self.prune(registry)
+
+            slot = min(
+                range(self.size),
+                key=lambda i: len(self.get_instance(registry, i)["leases"]),
+            )
+            instance = self.get_instance(registry, slot)
+            if os.getpid() not in instance["leases"]:
+                instance["leases"].append(os.getpid())
+
+            self.write_registry(registry)
+
+        frappe.logger().info(
+            f"Leased Chrome pool instance {slot} on port {instance['port']}"
+        )
+        if slot not in self.leased_slots:
+            self.leased_slots.add(slot)
+            atexit.register(self.release, slot)
+        return self.make_manager(slot, instance)
+
+    def release(self, slot):
+        """Give up this worker's lease on `slot`, Chrome keeps running"""
+        try:
+            with filelock(POOL_LOCK, is_global=True):
+                registry = self.read_registry()
+                instance = self.get_instance(registry, slot)
+                if os.getpid() in instance["leases"]:
+                    instance["leases"].remove(os.getpid())
+                    self.write_registry(registry)
+        except Exception:
+            pass
+
+    def start_instance(self, manager):
+        """Start Chrome for the manager's slot unless another worker already did
+
+        Chromium is located, or downloaded, before taking the pool lock. The
+        slot is then marked as starting and the lock released while Chrome
+        boots, workers starting the same slot meanwhile wait for it.
+        """
+        manager.executable_path = manager.get_chrome_path()
+
+        while True:
+            with filelock(POOL_LOCK, is_global=True):
+                registry = self.read_registry()
+                instance = self.get_instance(registry, manager.slot)
+
+                if instance["pid"] and is_chrome_process(
+                    instance["pid"], instance["port"]
+                ):
+                    manager.attach(instance["pid"])
+                    return manager
+
+                if not self.is_starting(instance):
+                    self.mark_starting(registry, instance)
+                    break
+
+            time.sleep(0.1)
+
+        try:
+            manager.start()
+        finally:
+            self.finish_start(manager)
+
+        return manager
+
+    def is_starting(self, instance):
+        """Check if a live worker is booting Chrome for the instance"""
+        pid = instance.get("starting")
+        return bool(
+            pid
+            and psutil.pid_exists(pid)
+            and time.time() - instance.get("starting_at", 0) < 2 * self.start_timeout
+        )
+
+    def mark_starting(self, registry, instance):
+        """Claim the instance for booting, must be called holding the pool lock"""
+        instance["pid"] = None
+        instance["starting"] = os.getpid()
+        instance["starting_at"] = time.time()
+        self.write_registry(registry)
+
+    def finish_start(self, manager, **fields):
+        """Record the manager's Chrome and `fields` once it started, or failed to"""
+        with filelock(POOL_LOCK, is_global=True):
+            registry = self.read_registry()
+            instance = self.get_instance(registry, manager.slot)
+            instance["starting"] = None
+            instance["pid"] = manager.pid
+            if manager.pid:
+                instance["started_at"] = time.time()
+                instance.update(fields)
+            self.write_registry(registry)
+
+    def get_managers(self):
+        """Get managers for all pool instances, starting the stopped ones"""
+        with filelock(POOL_LOCK, is_global=True):
+            registry = self.read_registry()
+            managers = [
+                self.make_manager(slot, self.get_instance(registry, slot))
+                for slot in range(self.size)
+            ]
+
+        for manager in managers:
+            if not manager.is_running():
+                self.start_instance(manager)
+
+        return managers
+
+    def get_running_managers(self):
+        """Get managers for the pool instances that have a live Chrome"""
+        with filelock(POOL_LOCK, is_global=True):
+            registry = self.read_registry()
+            managers = [
+                self.make_manager(slot, self.get_instance(registry, slot))
+                for slot in range(self.size)
+            ]
+
+        return [manager for manager in managers if manager.pid]
+
+    def stop_instance(self, manager):
+        """Stop the manager's Chrome and remove it from the registry"""
+        with filelock(POOL_LOCK, is_global=True):
+            registry = self.read_registry()
+            instance = self.get_instance(registry, manager.slot)
+            manager.stop()
+            instance["pid"] = None
+            self.write_registry(registry)
+
+    def get_status(self):
+        """Get state of all pool instances"""
+        from .chrome_watchdog import get_chrome_watchdog
+
+        with filelock(POOL_LOCK, is_global=True):
+            registry = self.read_registry()
+            self.prune(registry)
+
+        status = []
+        for slot in range(self.size):
+            instance = self.get_instance(registry, slot)
+            running = bool(instance["pid"]) and is_chrome_process(
+                instance["pid"], instance["port"]
+            )
+            entry = {
+                "slot": slot,
+                "port": instance["port"],
+                "pid": instance["pid"] if running else None,
+                "status": "running"
+                if running
+                else "starting"
+                if self.is_starting(instance)
+                else "stopped",
+                "leases": len(instance["leases"]),
+                "recycles": instance.get("recycles", 0),
+                "last_recycle": instance.get("last_recycle"),
+            }
+            if running:
+                entry.update(
+                    get_chrome_watchdog().get_status(instance["port"], instance["pid"])
+                )
+            status.append(entry)
+        return status
+
+
+# Global Chrome pool instance
+_chrome_pool = None
+
+
+def get_chrome_pool():
+    """Get singleton Chrome pool instance"""
+    global _chrome_pool
+    if _chrome_pool is None:
+        _chrome_pool = ChromePool()
+    return _chrome_pool
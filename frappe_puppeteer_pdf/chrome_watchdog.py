@@ -0,0 +1,281 @@
+import os
+import socket
+import time
+from contextlib import contextmanager
+
+import frappe
+import psutil
+from frappe.utils import cint
+from frappe.utils.synchronization import filelock
+
+from .chrome_pool import POOL_LOCK, get_chrome_pool
+
+WATCHDOG_PREFIX = "chrome_watchdog"
+# Drain markers outlive any render, but don't pile up forever
+DRAIN_EXPIRY = 86400
+# Scheduler ticks enqueue the check for every site of the bench at once,
+# only the first of them within this many seconds runs it
+CHECK_EXPIRY = 60
+
+
+class ChromeWatchdog:
+    """Recycle pool instances that rendered too much or grew too large
+
+    Renders in flight on an instance are counted per worker in Redis. Once an
+    instance crosses a threshold it is marked as draining: running renders
+    finish undisturbed, new ones wait, and whoever sees it idle restarts it
+    under the pool lock. Keys include host, port and Chrome pid, so counters
+    start afresh with every Chrome process.
+    """
+
+    def __init__(self):
+        config = frappe.get_common_site_config()
+        self.max_renders = cint(config.get("chrome_recycle_renders", 1000))
+        self.max_memory = cint(config.get("chrome_recycle_memory_mb", 1024)) << 20
+        self.interval = cint(config.get("chrome_watchdog_interval", 30))
+        self.drain_timeout = cint(config.get("chrome_drain_timeout", 60))
+        self.sampled_at = {}
+
+    def get_key(self, port, pid, name):
+        return f"{WATCHDOG_PREFIX}:{socket.gethostname()}:{port}:{pid}:{name}"
+
+    @contextmanager
+    def track_render(self, chrome_manager):
+        """Count a render on the manager's instance for the enclosed block
+
+        Waits while the instance is draining. Managers outside the pool are
+        not watched.
+        """
+        if chrome_manager.slot is None:
+            yield
+            return
+
+        port, pid = self.acquire(chrome_manager)
+        try:
+            yield
+        finally:
+            frappe.cache().hincrby(self.get_key(port, pid, "active"), os.getpid(), -1)
+            try:
+                self.after_render(chrome_manager, port, pid)
+            except Exception as e:
+                # The render itself succeeded, don't fail it over a recycle
+                frappe.log_error(f"Chrome watchdog failed: {e}")
+
+    def acquire(self, chrome_manager):
+        """Register a render on a non-draining instance, returns (port, pid)"""
+        cache = frappe.cache()
+        deadline = time.monotonic() + self.drain_timeout
+        delay = 0.05
+
+        while True:
+            if not chrome_manager.is_running():
+                get_chrome_pool().start_instance(chrome_manager)
+
+            port, pid = chrome_manager.port, chrome_manager.pid
+            active_key = self.get_key(port, pid, "active")
+
+            # Count the render before looking for a drain, recycle() sets the
+            # marker before counting, so one of both always sees the other
+            cache.hincrby(active_key, os.getpid(), 1)
+            if not cache.get(self.get_key(port, pid, "draining")):
+                return port, pid
+
+            cache.hincrby(active_key, os.getpid(), -1)
+            self.recycle(chrome_manager)
+
+            if time.monotonic() > deadline:
+                frappe.logger().warning(
+                    f"Chrome pool instance {chrome_manager.slot} still draining "
+                    f"after {self.drain_timeout}s, rendering on it anyway"
+                )
+                cache.hincrby(active_key, os.getpid(), 1)
+                return port, pid
+
+            time.sleep(delay)
+            delay = min(delay * 2, 0.5)
+
+    def after_render(self, chrome_manager, port, pid):
+        """Count a finished render and drain or recycle the instance if due"""
+        cache = frappe.cache()
+        renders = cache.incr(self.get_key(port, pid, "renders"))
+
+        reason = self.get_recycle_reason(chrome_manager.slot, pid, renders)
+        if reason:
+            self.drain(chrome_manager.slot, port, pid, reason)
+
+        if cache.get(self.get_key(port, pid, "draining")):
+            self.recycle(chrome_manager)
+
+    def get_active(self, port, pid):
+        """Get the number of renders in flight, ignoring workers that died"""
+        # Counters are plain integers, bypass the wrapper's unpickling hgetall
+        counts = frappe.cache().execute_command(
+            "HGETALL", self.get_key(port, pid, "active")
+        )
+        return sum(
+            int(count)
+            for worker, count in (counts or {}).items()
+            if psutil.pid_exists(int(worker))
+        )
+
+    def get_recycle_reason(self, slot, pid, renders, force_sample=False):
+        """Get why the instance should be recycled, or None"""
+        if self.max_renders and renders >= self.max_renders:
+            return f"{renders} renders (limit {self.max_renders})"
+
+        if not self.max_memory:
+            return None
+
+        # Walking the process tree is not free, sample it every few seconds
+        now = time.monotonic()
+        if not force_sample and now - self.sampled_at.get(slot, 0) < self.interval:
+            return None
+        self.sampled_at[slot] = now
+
+        rss = get_process_tree_rss(pid)
+        if rss > self.max_memory:
+            return f"{rss >> 20} MB RSS (limit {self.max_memory >> 20} MB)"
+
+        return None
+
+    def drain(self, slot, port, pid, reason):
+        """Stop handing out the instance to new renders"""
+        if frappe.cache().set(
+            self.get_key(port, pid, "draining"), reason, nx=True, ex=DRAIN_EXPIRY
+        ):
+            frappe.logger().info(f"Draining Chrome pool instance {slot}: {reason}")
+
+    def recycle(self, chrome_manager):
+        """Restart a draining instance once no render is in flight on it"""
+        cache = frappe.cache()
+        pool = get_chrome_pool()
+        # Not while holding the pool lock, locating Chromium may download it
+        chrome_manager.executable_path = chrome_manager.get_chrome_path()
+
+        with filelock(POOL_LOCK, is_global=True):
+            registry = pool.read_registry()
+            instance = pool.get_instance(registry, chrome_manager.slot)
+
+            # Another worker restarted it already
+            port, pid = instance["port"], instance["pid"]
+            if not pid or pid != chrome_manager.pid:
+                return False
+
+            reason = cache.get(self.get_key(port, pid, "draining"))
+            if not reason or self.get_active(port, pid):
+                return False
+
+            started_at = time.monotonic()
+            recycles = instance.get("recycles", 0) + 1
+            chrome_manager.stop()
+            # Chrome boots without the lock, other workers wait for the slot
+            pool.mark_starting(registry, instance)
+
+        try:
+            chrome_manager.start()
+        finally:
+            # Don't leave the stopped pid behind if Chrome fails to start
+            pool.finish_start(
+                chrome_manager,
+                recycles=recycles,
+                last_recycle={"reason": frappe.safe_decode(reason), "at": time.time()},
+            )
+
+        cache.delete(*(self.get_key(port, pid, name) for name in COUNTERS))
+        self.sampled_at.pop(chrome_manager.slot, None)
+
+        frappe.logger().info(
+            f"Recycled Chrome pool instance {chrome_manager.slot} on port {port} "
+            f"in {(time.monotonic() - started_at) * 1000:.0f} ms: "
+            f"{frappe.safe_decode(reason)}"
+        )
+        return True
+
+    def check(self):
+        """Check all running pool instances, recycling idle ones over a limit"""
+        cache = frappe.cache()
+        pool = get_chrome_pool()
+
+        for manager in pool.get_running_managers():
+            renders = cint(
+                cache.get(self.get_key(manager.port, manager.pid, "renders"))
+            )
+            reason = self.get_recycle_reason(
+                manager.slot, manager.pid, renders, force_sample=True
+            )
+            if reason:
+                self.drain(manager.slot, manager.port, manager.pid, reason)
+
+            if cache.get(self.get_key(manager.port, manager.pid, "draining")):
+                self.recycle(manager)
+
+    def get_status(self, port, pid):
+        """Get render counters and drain state of an instance"""
+        cache = frappe.cache()
+        draining = cache.get(self.get_key(port, pid, "draining"))
+        return {
+            "renders": cint(cache.get(self.get_key(port, pid, "renders"))),
+            "active": self.get_active(port, pid),
+            "draining": frappe.safe_decode(draining) if draining else None,
+            "rss": get_process_tree_rss(pid),
+        }
+
+
+COUNTERS = ("active", "renders", "draining")
+
+
+def get_process_tree_rss(pid):
+    """Get the summed RSS of a process and all of its children"""
+    try:
+        process = psutil.Process(pid)
+        processes = [process, *process.children(recursive=True)]
+    except psutil.Error:
+        return 0
+
+    rss = 0
+    for process in processes:
+        try:
+            rss += process.memory_info().rss
+        except psutil.Error:
+            pass
+    return rss
+
+
+def is_chrome_watchdog_enabled():
+    return cint(frappe.get_common_site_config().get("chrome_watchdog", 1))
+
+
+# Global watchdog instance
+_chrome_watchdog = None
+
+
+def get_chrome_watchdog():
+    """Get singleton Chrome watchdog"""
+    global _chrome_watchdog
+    if _chrome_watchdog is None:
+        _chrome_watchdog = ChromeWatchdog()
+    return _chrome_watchdog
+
+
+@contextmanager
+def track_render(chrome_manager):
+    """Count a render on the manager's instance if the watchdog is enabled"""
+    if not is_chrome_watchdog_enabled():
+        yield
+        return
+
+    with get_chrome_watchdog().track_render(chrome_manager):
+        yield
+
+
+def check_chrome_pool():
+    """Scheduled check recycling instances that crossed a limit while idle
+
+    The pool is bench-wide, it is checked once per tick, not once per site.
+    """
+    if not is_chrome_watchdog_enabled():
+        return
+
+    key = f"{WATCHDOG_PREFIX}:{socket.gethostname()}:last_check"
+    if frappe.cache().set(key, time.time(), nx=True, ex=CHECK_EXPIRY):
+        get_chrome_watchdog().check()
@@ -0,0 +1,439 @@
+import os
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import Future
+from contextlib import ExitStack
+from io import BytesIO
+
+import frappe
+from frappe.utils import cint
+from pypdf import PdfReader, PdfWriter
+
+from .async_engine import get_async_engine, is_async_engine_enabled
+from .chrome_watchdog import track_render
+from .pdf_generator import generate_with_playwright, submit_to_engine
+from .render_metrics import RenderMetrics
+
+# Tags, skipping comments and the contents of raw text elements
+TAG_RE = re.compile(
+    r"<!--.*?-->"
+    r"|<(?P<raw>script|style|textarea)\b[^>]*>.*?</(?P=raw)\s*>"
+    r"|<(?P<close>/?)(?P<tag>[a-zA-Z][\w-]*)\b[^>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+START_TAG_NAME_RE = re.compile(r"^<[a-zA-Z][\w-]*")
+BREAK_BEFORE_RE = re.compile(
+    r"\b(?:page-)?break-before\s*:\s*(?:always|page)", re.IGNORECASE
+)
+BREAK_AFTER_RE = re.compile(
+    r"\bclass=\"[^\"]*\bpage-break\b|\b(?:page-)?break-after\s*:\s*(?:always|page)",
+    re.IGNORECASE,
+)
+SECTION_RE = re.compile(r"\bid=[\"'](?:header-html|footer-html)[\"']")
+PAGE_NUMBER_RE = re.compile(
+    r"\bclass=[\"'][^\"']*(?<![\w-])(?:page|topage|sitepage|sitepages)(?![\w-])"
+)
+
+VOID_ELEMENTS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "param",
+    "source",
+    "track",
+    "wbr",
+}
+# Elements closed by the start of another one, print HTML often leaves
+# table cells and rows open
+IMPLIED_END = {
+    "tr": {"tr", "td", "th"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "thead": {"thead", "tbody", "tfoot", "tr", "td", "th"},
+    "tbody": {"thead", "tbody", "tfoot", "tr", "td", "th"},
+    "tfoot": {"thead", "tbody", "tfoot", "tr", "td", "th"},
+}
+# A chunk never ends inside of these
+NO_CUT_INSIDE = {"tr", "td", "th", "thead", "tfoot", "caption"}
+
+# Chunks print their header and footer without page numbers, the merged PDF
+# gets them from an overlay holding nothing but the page numbers
+HIDE_PAGE_NUMBERS_STYLE = (
+    "<style>.pageNumber, .totalPages { visibility: hidden !important; }</style>"
+)
+PAGE_NUMBERS_ONLY_STYLE = (
+    "<style>html, body { background: transparent !important; } "
+    "* { visibility: hidden !important; } "
+    ".pageNumber, .totalPages { visibility: visible !important; }</style>"
+)
+BLANK_PAGE = '<div style="height: 1px; break-after: page"></div>'
+
+
+class OpenElement:
+    """An element the splitter is inside of at some point of the document"""
+
+    def __init__(self, tag, start_tag, end):
+        self.tag = tag
+        self.start_tag = start_tag
+        # End of the start tag in the document
+        self.end = end
+        # Caption, colgroup and thead of a table, repeated in every chunk
+        self.prelude = None
+        self.break_after = bool(BREAK_AFTER_RE.search(start_tag))
+        self.section_start = None
+
+
+class ChunkSplitter:
+    """Split print HTML into documents of about `chunk_size` characters
+
+    Chunks only end where Chrome could start a new page anyway: at page
+    break markers and between the rows of a table body. Elements open at a
+    cut are closed, and reopened at the start of the next chunk after the
+    document's head, with the caption, colgroup and thead of open tables.
+
+    With `lift_sections`, #header-html and #footer-html are taken out of the
+    flow and copied into every chunk, so that all of them print the same
+    native header and footer.
+    """
+
+    def __init__(self, html, chunk_size, lift_sections=False):
+        self.html = html
+        self.chunk_size = chunk_size
+        self.document_start = None
+        self.body_start_tag = None
+        self.body_end = None
+        self.sections = []
+        self.skip = []
+        if lift_sections:
+            self.find_sections()
+
+    def walk(self, stack):
+        """Walk the tags of the document, keeping open elements in `stack`
+
+        Yields ("open", match, element) after an element was pushed and
+        ("close", match, elements) after elements were popped. Lifted
+        sections are jumped over.
+        """
+        html = self.html
+        skip = deque(self.skip)
+        pos = 0
+
+        while True:
+            match = TAG_RE.search(html, pos)
+            if not match:
+                return
+
+            if skip and match.start() >= skip[0][0]:
+                pos = max(pos, skip.popleft()[1])
+                continue
+
+            pos = match.end()
+            tag = match.group("tag")
+            if not tag:
+                continue
+            tag = tag.lower()
+
+            if match.group("close"):
+                for i in range(len(stack) - 1, -1, -1):
+                    if stack[i].tag == tag:
+                        popped = stack[i:]
+                        del stack[i:]
+                        yield "close", match, popped
+                        break
+                continue
+
+            if tag in VOID_ELEMENTS or match.group(0).endswith("/>"):
+                continue
+
+            implied = IMPLIED_END.get(tag)
+            if implied:
+                while stack and stack[-1].tag in implied:
+                    stack.pop()
+
+            if tag == "body" and self.body_start_tag is None:
+                self.document_start = html[: match.start()]
+                self.body_start_tag = match.group(0)
+                self.body_end = match.end()
+
+            # Everything between a table and its first row goes with each part
+            parent = stack[-1] if stack else None
+            if (
+                tag in ("tbody", "tr")
+                and parent
+                and parent.tag == "table"
+                and parent.prelude is None
+            ):
+                parent.prelude = html[parent.end : match.start()]
+
+            element = OpenElement(tag, match.group(0), match.end())
+            stack.append(element)
+            yield "open", match, element
+
+    def find_sections(self):
+        """Find #header-html and #footer-html along with their ancestors"""
+        stack = []
+        for event, match, elements in self.walk(stack):
+            if event == "open":
+                if (
+                    SECTION_RE.search(match.group(0))
+                    and get_body_index(stack) is not None
+                ):
+                    elements.section_start = match.start()
+                continue
+
+            body_index = get_body_index(stack)
+            for element in elements:
+                if element.section_start is None or body_index is None:
+                    continue
+
+                ancestors = stack[body_index + 1 :]
+                self.sections.append(
+                    (
+                        "".join(make_wrapper(e.start_tag) for e in ancestors),
+                        self.html[element.section_start : match.end()],
+                        "".join(f"</{e.tag}>" for e in reversed(ancestors)),
+                    )
+                )
+                self.skip.append((element.section_start, match.end()))
+
+        self.skip.sort()
+        # Start afresh for the split
+        self.document_start = self.body_start_tag = self.body_end = None
+
+    def split(self):
+        """Yield the chunks, each a complete HTML document"""
+        stack = []
+        prefix = ""
+        chunk_start = 0
+
+        for event, match, elements in self.walk(stack):
+            if event == "open":
+                parents = stack[:-1]
+                is_row = elements.tag == "tr" and (
+                    parents and parents[-1].tag in ("tbody", "table")
+                )
+                if not (is_row or BREAK_BEFORE_RE.search(match.group(0))):
+                    continue
+                cut, cut_stack = match.start(), parents
+            elif any(element.break_after for element in elements):
+                cut, cut_stack = match.end(), stack
+            else:
+                continue
+
+            if cut - chunk_start < self.chunk_size or not self.can_cut(cut_stack):
+                continue
+
+            yield prefix + self.get_text(chunk_start, cut) + "".join(
+                f"</{element.tag}>" for element in reversed(cut_stack)
+            )
+            prefix, chunk_start = self.reopen(cut_stack), cut
+
+        yield prefix + self.get_text(chunk_start, len(self.html))
+
+    def can_cut(self, stack):
+        return get_body_index(stack) is not None and not any(
+            element.tag in NO_CUT_INSIDE for element in stack
+        )
+
+    def get_text(self, start, end):
+        """Get the document between `start` and `end`
+
+        Lifted sections are left out, and inserted after the body's start tag.
+        """
+        parts = []
+        position = start
+        for skip_start, skip_end in self.skip:
+            if skip_end <= position or skip_start >= end:
+                continue
+            parts.append(self.html[position:skip_start])
+            position = skip_end
+        parts.append(self.html[position:end])
+
+        # Sections come after the body's start tag, nothing before it is skipped
+        body_end = self.body_end
+        if self.sections and body_end is not None and start <= body_end < end:
+            parts.insert(0, self.html[start:body_end])
+            parts.insert(1, self.get_sections_html(HIDE_PAGE_NUMBERS_STYLE))
+            parts[2] = parts[2][body_end - start :]
+        return "".join(parts)
+
+    def reopen(self, stack):
+        """Get the start of a chunk continuing inside the elements of `stack`"""
+        parts = [self.document_start]
+        for element in stack[get_body_index(stack) :]:
+            parts.append(element.start_tag)
+            if element.tag == "body":
+                parts.append(self.get_sections_html(HIDE_PAGE_NUMBERS_STYLE))
+            elif element.tag == "table" and element.prelude:
+                parts.append(element.prelude)
+        return "".join(parts)
+
+    def get_sections_html(self, style):
+        """Get the lifted sections with `style` added to each of them"""
+        return "".join(
+            wrapper_start + add_to_start_tag(section, style) + wrapper_end
+            for wrapper_start, section, wrapper_end in self.sections
+        )
+
+    def has_page_numbers(self):
+        return any(PAGE_NUMBER_RE.search(section) for _, section, _ in self.sections)
+
+    def make_page_number_overlay(self, pages):
+        """Get a document of `pages` blank pages numbered by the lifted sections"""
+        return (
+            self.document_start
+            + self.body_start_tag
+            + self.get_sections_html(PAGE_NUMBERS_ONLY_STYLE)
+            + BLANK_PAGE * (pages - 1)
+            + '<div style="height: 1px"></div></body></html>'
+        )
+
+
+def get_body_index(stack):
+    for i, element in enumerate(stack):
+        if element.tag == "body":
+            return i
+    return None
+
+
+def make_wrapper(start_tag):
+    """Turn an ancestor's start tag into a wrapper that doesn't take up space
+
+    Sections keep the styles they inherit, without the ancestor's padding.
+    """
+    return START_TAG_NAME_RE.sub(
+        lambda match: f'{match.group(0)} style="display: contents"', start_tag, 1
+    )
+
+
+def add_to_start_tag(html, text):
+    end = html.index(">") + 1
+    return html[:end] + text + html[end:]
+
+
+def generate_in_chunks(
+    html,
+    options,
+    chrome_manager,
+    readiness="networkidle",
+    render_timeout=30000,
+    output=None,
+    metrics=None,
+    header_footer=False,
+):
+    """Render a large document in chunks and merge them into one PDF
+
+    Chunks are rendered concurrently on the asyncio engine when it is
+    enabled, one after another otherwise. Each is written to a temporary
+    file and merged in document order as soon as it is done, so Chrome only
+    ever holds a chunk's DOM. Returns like generate_with_playwright.
+    """
+    metrics = metrics or RenderMetrics()
+    chunk_size = max(cint(frappe.conf.get("chrome_chunk_kb", 512)), 1) << 10
+    splitter = ChunkSplitter(html, chunk_size, lift_sections=header_footer)
+
+    use_engine = is_async_engine_enabled()
+    # Chunks in flight, each one is held in memory until it is merged
+    window = 2 * get_async_engine(chrome_manager).concurrency if use_engine else 1
+    timeout = cint(frappe.conf.get("chrome_async_timeout", 300)) or None
+
+    def render(chunk_html, path):
+        kwargs = {
+            "readiness": readiness,
+            "render_timeout": render_timeout,
+            "output": path,
+            "metrics": metrics,
+            "header_footer": header_footer,
+        }
+        if use_engine:
+            return submit_to_engine(chunk_html, options, chrome_manager, **kwargs)
+
+        future = Future()
+        future.set_result(
+            generate_with_playwright(chunk_html, options, chrome_manager, **kwargs)
+        )
+        return future
+
+    writer = PdfWriter()
+    pending = deque()
+    chunks = 0
+
+    def merge_next():
+        future, path = pending.popleft()
+        future.result(timeout=timeout)
+        with metrics.stage("merge"):
+            writer.append(PdfReader(path))
+        os.remove(path)
+
+    with ExitStack() as stack:
+        if use_engine:
+            # generate_with_playwright tracks each of its renders itself
+            stack.enter_context(track_render(chrome_manager))
+        tmp_dir = stack.enter_context(
+            tempfile.TemporaryDirectory(prefix="chrome-pdf-chunks-")
+        )
+
+        try:
+            for chunk_html in splitter.split():
+                path = os.path.join(tmp_dir, f"{chunks}.pdf")
+                pending.append((render(chunk_html, path), path))
+                chunks += 1
+                if len(pending) >= window:
+                    merge_next()
+
+            while pending:
+                merge_next()
+        except Exception:
+            for future, _path in pending:
+                future.cancel()
+            raise
+
+        if header_footer and splitter.has_page_numbers():
+            with metrics.stage("page_numbers"):
+                path = os.path.join(tmp_dir, "page_numbers.pdf")
+                overlay = splitter.make_page_number_overlay(len(writer.pages))
+                render(overlay, path).result(timeout=timeout)
+                add_page_numbers(writer, path)
+
+    frappe.logger().info(
+        f"Rendered PDF of {len(html) >> 10} KB HTML in {chunks} chunks, "
+        f"{len(writer.pages)} pages"
+    )
+
+    with metrics.stage("merge"):
+        if output:
+            with open(output, "wb") as f:
+                writer.write(f)
+            return output
+
+        buffer = BytesIO()
+        writer.write(buffer)
+        return buffer.getvalue()
+
+
+def add_page_numbers(writer, overlay_path):
+    """Stamp the pages of the page number overlay onto the merged pages"""
+    overlay = PdfReader(overlay_path)
+    if len(overlay.pages) != len(writer.pages):
+        frappe.logger().warning(
+            f"Page number overlay has {len(overlay.pages)} pages instead of "
+            f"{len(writer.pages)}, leaving the PDF without page numbers"
+        )
+        return
+
+    for page, overlay_page in zip(writer.pages, overlay.pages):
+        page.merge_page(overlay_page)
+
+
+def should_render_in_chunks(html):
+    """Check if a document is large enough to be rendered in chunks"""
+    threshold = cint(frappe.conf.get("chrome_chunked_render_kb", 0)) << 10
+    return bool(threshold) and len(html) >= threshold
@@ -0,0 +1,121 @@
+import os
+import socket
+
+import frappe
+from frappe.utils import cint
+
+BREAKER_PREFIX = "chrome_breaker"
+
+
+class CircuitBreaker:
+    """Stop sending renders to Chrome after repeated failures
+
+    After `threshold` consecutive failures the circuit opens and renders go
+    straight to the wkhtmltopdf fallback for `cooldown` seconds. Then it is
+    half-open: a single render probes Chrome, closing the circuit on success
+    and opening it for another cool-down on failure.
+
+    State lives in Redis and is shared by all workers of this host, like the
+    Chrome pool itself.
+    """
+
+    def __init__(self):
+        config = frappe.get_common_site_config()
+        self.threshold = cint(config.get("chrome_breaker_threshold", 5))
+        self.cooldown = max(cint(config.get("chrome_breaker_cooldown", 60)), 1)
+
+    def get_key(self, name):
+        return f"{BREAKER_PREFIX}:{socket.gethostname()}:{name}"
+
+    def get_failures(self):
+        return cint(frappe.cache().get(self.get_key("failures")))
+
+    def is_open(self):
+        """Check whether the circuit is open and in its cool-down"""
+        if self.threshold <= 0:
+            return False
+        return bool(frappe.cache().get(self.get_key("open")))
+
+    def allow_request(self):
+        """Check whether a render may use Chrome
+
+        While half-open only one caller gets through as the probe.
+        """
+        if self.threshold <= 0 or self.get_failures() < self.threshold:
+            return True
+
+        cache = frappe.cache()
+        if cache.get(self.get_key("open")):
+            return False
+
+        # Cool-down is over, let a single probe through. It expires in case
+        # the probing worker dies before reporting back.
+        return bool(
+            cache.set(self.get_key("probe"), os.getpid(), nx=True, ex=self.cooldown)
+        )
+
+    def record_success(self):
+        failures = self.get_failures()
+        if not failures:
+            return
+
+        self.reset()
+        if self.threshold > 0 and failures >= self.threshold:
+            frappe.logger().info("Chrome recovered, closing PDF circuit breaker")
+
+    def record_failure(self, error=None):
+        if self.threshold <= 0:
+            return
+
+        cache = frappe.cache()
+        failures = cache.incr(self.get_key("failures"))
+        if failures < self.threshold:
+            return
+
+        # Open on reaching the threshold, or reopen after a failed probe
+        is_probe = cache.delete(self.get_key("probe"))
+        if failures == self.threshold or is_probe:
+            cache.set(self.get_key("open"), str(error or ""), ex=self.cooldown)
+            frappe.logger().warning(
+                f"Opening PDF circuit breaker for {self.cooldown}s after "
+                f"{failures} consecutive Chrome failures: {error}"
+            )
+
+    def get_state(self):
+        if self.threshold <= 0 or self.get_failures() < self.threshold:
+            state = "closed"
+        elif self.is_open():
+            state = "open"
+        else:
+            state = "half_open"
+
+        return {
+            "state": state,
+            "failures": self.get_failures(),
+            "threshold": self.threshold,
+            "cooldown": self.cooldown,
+        }
+
+    def reset(self):
+        frappe.cache().delete(
+            self.get_key("failures"), self.get_key("open"), self.get_key("probe")
+        )
+
+
+# Global circuit breaker instance
+_circuit_breaker = None
+
+
+def get_circuit_breaker():
+    """Get singleton Chrome circuit breaker"""
+    global _circuit_breaker
+    if _circuit_breaker is None:
+        _circuit_breaker = CircuitBreaker()
+    return _circuit_breaker
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_circuit_breaker():
+    """Close the circuit breaker and send renders to Chrome again"""
+    frappe.only_for("System Manager")
+    get_circuit_breaker().reset()
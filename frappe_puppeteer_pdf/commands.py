@@ -0,0 +1,50 @@
+import json
+
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("benchmark-pdf")
+@click.option(
+    "--case",
+    "cases",
+    multiple=True,
+    help="Corpus case to render, can be repeated (default: all)",
+)
+@click.option("--iterations", default=5, type=int, help="Timed renders per case")
+@click.option("--warmup", default=1, type=int, help="Untimed renders per case")
+@click.option(
+    "--skip-wkhtmltopdf", is_flag=True, help="Don't compare against wkhtmltopdf"
+)
+@click.option("--output", help="Write JSON results to this file")
+@click.option("--json", "as_json", is_flag=True, help="Print JSON results")
+@pass_context
+def benchmark_pdf(
+    context, cases, iterations, warmup, skip_wkhtmltopdf, output, as_json
+):
+    """Benchmark Chrome PDF rendering on a synthetic corpus"""
+    import frappe
+
+    from frappe_puppeteer_pdf.benchmark import format_summary, run_benchmark
+
+    site = get_site(context)
+    frappe.init(site=site)
+    frappe.connect()
+    try:
+        results = run_benchmark(
+            cases=list(cases) or None,
+            iterations=iterations,
+            warmup=warmup,
+            wkhtmltopdf=not skip_wkhtmltopdf,
+            output=output,
+        )
+    finally:
+        frappe.destroy()
+
+    if as_json:
+        click.echo(json.dumps(results, indent=2, sort_keys=True))
+    else:
+        click.echo(format_summary(results))
+
+
+commands = [benchmark_pdf]
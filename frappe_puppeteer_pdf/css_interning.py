@@ -0,0 +1,151 @@
+import hashlib
+import re
+from html import unescape
+
+import frappe
+from frappe.utils import cint
+
+# Start tags carrying a style attribute, outside of scripts, textareas,
+# style elements and comments, which are matched as `skip`
+TAG_WITH_STYLE_RE = re.compile(
+    r"(?P<skip><script\b[^>]*>.*?</script\s*>|<textarea\b[^>]*>.*?</textarea\s*>"
+    r"|<style\b[^>]*>.*?</style\s*>|<!--.*?-->)"
+    r"|<[a-zA-Z][^<>]*?\sstyle=\"[^\"]*\"[^<>]*>",
+    re.IGNORECASE | re.DOTALL,
+)
+STYLE_BLOCK_RE = re.compile(
+    r"<style\b[^>]*>(.*?)</style\s*>", re.IGNORECASE | re.DOTALL
+)
+IMPORTANT_PROPERTY_RE = re.compile(r"([\w-]+)\s*:[^;{}]*!\s*important", re.IGNORECASE)
+STYLE_ATTR_RE = re.compile(r"\sstyle=\"([^\"]*)\"")
+CLASS_ATTR_RE = re.compile(r"\sclass=\"([^\"]*)\"")
+
+
+class StyleInterner:
+    """Intern identical style declarations into generated class names
+
+    Each distinct declaration block becomes one `.pd-s-<hash>` rule in a
+    single shared `<style>` block, instead of being repeated inline on every
+    element that uses it.
+    """
+
+    def __init__(self):
+        self.classes = {}
+        # Properties the document's stylesheets set with !important
+        self.important_properties = set()
+
+    def intern(self, declarations):
+        """Get the class name for `declarations`, registering it if new"""
+        class_name = self.classes.get(declarations)
+        if class_name is None:
+            digest = hashlib.sha1(declarations.encode("utf-8")).hexdigest()[:10]
+            class_name = self.classes[declarations] = f"pd-s-{digest}"
+        return class_name
+
+    def get_style_block(self):
+        """Get the shared `<style>` block for all interned declarations"""
+        if not self.classes:
+            return ""
+        rules = "".join(
+            f".{class_name}{{{declarations}}}"
+            for declarations, class_name in self.classes.items()
+        )
+        return f'<style data-pd-interned-styles="true">{rules}</style>'
+
+    def rewrite_tag(self, match):
+        tag = match.group(0)
+        if match.group("skip"):
+            return tag
+
+        # The attribute is HTML, the style block CSS
+        declarations = unescape(STYLE_ATTR_RE.search(tag).group(1))
+
+        # Only intern convert_css output, plain inline styles would lose
+        # their precedence over stylesheet rules. A class rule also loses to
+        # more specific !important rules, keep styles competing with those.
+        if (
+            "!important" not in declarations
+            or "<" in declarations
+            or self.important_properties & get_properties(declarations)
+        ):
+            return tag
+
+        class_name = self.intern(declarations)
+        tag = STYLE_ATTR_RE.sub("", tag, count=1)
+
+        class_match = CLASS_ATTR_RE.search(tag)
+        if class_match:
+            classes = f"{class_match.group(1)} {class_name}".strip()
+            return (
+                f"{tag[: class_match.start(1)]}{classes}{tag[class_match.end(1) :]}"
+            )
+
+        closing = 2 if tag.endswith("/>") else 1
+        return f'{tag[:-closing]} class="{class_name}"{tag[-closing:]}'
+
+    def rewrite(self, html):
+        """Move inline convert_css styles of `html` into the shared style block"""
+        self.important_properties = {
+            name.lower()
+            for block in STYLE_BLOCK_RE.findall(html)
+            for name in IMPORTANT_PROPERTY_RE.findall(block)
+        }
+        html = TAG_WITH_STYLE_RE.sub(self.rewrite_tag, html)
+        return inject_style_block(html, self.get_style_block())
+
+
+def get_properties(declarations):
+    """Get the lowercase property names of a declaration block"""
+    return {
+        declaration.split(":", 1)[0].strip().lower()
+        for declaration in declarations.split(";")
+        if ":" in declaration
+    }
+
+
+def inject_style_block(html, style_block):
+    """Insert `style_block` at the end of <head>, or at the start of the document"""
+    if not style_block:
+        return html
+
+    head_end = html.find("</head>")
+    if head_end == -1:
+        return style_block + html
+    return html[:head_end] + style_block + html[head_end:]
+
+
+def get_style_interner():
+    """Get the style interner of the current render"""
+    if getattr(frappe.local, "pdf_style_interner", None) is None:
+        frappe.local.pdf_style_interner = StyleInterner()
+    return frappe.local.pdf_style_interner
+
+
+def emit_interned_styles(html):
+    """Emit the rules of the classes interned while rendering `html` into it
+
+    Called for every rendered print body, whichever generator it goes to.
+    The interner starts afresh for the next document.
+    """
+    interner = get_style_interner()
+    frappe.local.pdf_style_interner = None
+    return inject_style_block(html, interner.get_style_block())
+
+
+def intern_inline_styles(html):
+    """Emit the shared style block of the current render into `html`
+
+    With `chrome_intern_css` enabled, inline convert_css styles are interned
+    too. Must run on the thread that rendered the HTML.
+    """
+    interner = get_style_interner()
+    try:
+        if is_css_interning_enabled():
+            return interner.rewrite(html)
+        return inject_style_block(html, interner.get_style_block())
+    finally:
+        frappe.local.pdf_style_interner = None
+
+
+def is_css_interning_enabled():
+    return cint(frappe.conf.get("chrome_intern_css", 0))
@@ -9,5 +9,32 @@ CUSTOM_FIELDS = {
 			"depends_on": "eval:doc.pdf_generator=='chrome'",
 			"insert_after": "pdf_generator",
 		},
+		{
+			"fieldname": "pdf_render_readiness",
+			"fieldtype": "Select",
+			"label": "Render Readiness",
+			"options": "networkidle\nload\ndomcontentloaded\njs_signal\nmax_wait",
+			"default": "networkidle",
+			"description": "When Chrome considers the page ready to print. js_signal waits for the window.__pdf_ready promise, max_wait waits for network idle but no longer than the render timeout.",
+			"depends_on": "eval:doc.pdf_generator=='chrome'",
+			"insert_after": "pdf_page_orientation",
+		},
+		{
+			"fieldname": "pdf_render_timeout",
+			"fieldtype": "Int",
+			"label": "Render Timeout (ms)",
+			"default": "30000",
+			"depends_on": "eval:doc.pdf_generator=='chrome'",
+			"insert_after": "pdf_render_readiness",
+		},
+		{
+			"fieldname": "pdf_native_header_footer",
+			"fieldtype": "Check",
+			"label": "Native Header and Footer",
+			"default": "0",
+			"description": "Print the header-html and footer-html sections as Chrome header and footer templates on every page, with page numbers for .page and .topage.",
+			"depends_on": "eval:doc.pdf_generator=='chrome'",
+			"insert_after": "pdf_render_timeout",
+		},
 	]
 }
@@ -0,0 +1,238 @@
+import base64
+import re
+from html import unescape
+from urllib.parse import urljoin
+
+from .asset_resolver import FORBIDDEN
+from .pdf_stream import map_playwright_to_cdp, to_inches
+from .render_profile import get_render_profile
+
+# Computed styles copied onto header/footer elements, Chrome renders the
+# templates in a document of their own without the print format's stylesheets
+INLINE_PROPERTIES = (
+    "display",
+    "box-sizing",
+    "width",
+    "max-width",
+    "height",
+    "float",
+    "clear",
+    "margin-top",
+    "margin-right",
+    "margin-bottom",
+    "margin-left",
+    "padding-top",
+    "padding-right",
+    "padding-bottom",
+    "padding-left",
+    "border-top",
+    "border-right",
+    "border-bottom",
+    "border-left",
+    "border-collapse",
+    "border-spacing",
+    "table-layout",
+    "vertical-align",
+    "font-family",
+    "font-size",
+    "font-style",
+    "font-weight",
+    "line-height",
+    "letter-spacing",
+    "white-space",
+    "text-align",
+    "text-decoration",
+    "text-transform",
+    "color",
+    "background-color",
+    "object-fit",
+)
+
+# wkhtmltopdf substitution classes and the Chrome template classes they map to
+PAGE_NUMBER_CLASSES = {
+    "page": "pageNumber",
+    "sitepage": "pageNumber",
+    "topage": "totalPages",
+    "sitepages": "totalPages",
+    "date": "date",
+    "title": "title",
+}
+
+# Takes the printable width in px, returns {header, footer} with the section's
+# HTML and height in px, or null for a missing section
+EXTRACT_SCRIPT = """({ width, properties, classes }) => {
+    const extract = (id) => {
+        const elements = document.querySelectorAll(`[id="${id}"]`);
+        if (!elements.length) return null;
+
+        const section = elements[0].cloneNode(true);
+        section.removeAttribute("id");
+        section.classList.remove("hidden-pdf", "visible-pdf");
+        section.querySelectorAll(".hidden-pdf, script").forEach((el) => el.remove());
+        section
+            .querySelectorAll(".visible-pdf")
+            .forEach((el) => el.classList.remove("visible-pdf"));
+
+        const container = document.createElement("div");
+        container.style.cssText =
+            `position: absolute; left: -100000px; top: 0; width: ${width}px;` +
+            "display: flow-root;";
+        container.appendChild(section);
+        document.body.appendChild(container);
+
+        const nodes = [section, ...section.querySelectorAll("*")];
+        const styles = nodes.map((node) => {
+            const computed = getComputedStyle(node);
+            return properties
+                .map((name) => `${name}: ${computed.getPropertyValue(name)}`)
+                .join("; ");
+        });
+        const height = container.getBoundingClientRect().height;
+
+        nodes.forEach((node, i) => {
+            node.setAttribute("style", styles[i]);
+            node.removeAttribute("class");
+        });
+        Object.entries(classes).forEach(([wkClass, chromeClass]) => {
+            nodes.forEach((node) => {
+                if (node.dataset.wkClasses?.split(" ").includes(wkClass)) {
+                    node.classList.add(chromeClass);
+                }
+            });
+        });
+        const html = section.outerHTML;
+        container.remove();
+        elements.forEach((el) => el.remove());
+        return { html, height };
+    };
+
+    // Remember wkhtmltopdf classes before class attributes are dropped
+    document
+        .querySelectorAll('[id="header-html"] *, [id="footer-html"] *')
+        .forEach((node) => {
+            if (node.classList.length) {
+                node.dataset.wkClasses = [...node.classList].join(" ");
+            }
+        });
+
+    return { header: extract("header-html"), footer: extract("footer-html") };
+}"""
+
+IMG_SRC_RE = re.compile(r"(<img\b[^>]*?\ssrc=\")([^\"]+)(\")", re.IGNORECASE)
+DATA_WK_CLASSES_RE = re.compile(r"\sdata-wk-classes=\"[^\"]*\"")
+
+# Gap between a header or footer and the page content
+SECTION_SPACING_MM = 3
+MM_PER_PX = 25.4 / 96
+
+
+def get_printable_width(pdf_options):
+    """Width of the page content area in CSS px"""
+    cdp_options = map_playwright_to_cdp(pdf_options)
+    paper_width = (
+        cdp_options["paperHeight"]
+        if cdp_options["landscape"]
+        else cdp_options["paperWidth"]
+    )
+    return (
+        paper_width - cdp_options["marginLeft"] - cdp_options["marginRight"]
+    ) * 96
+
+
+def get_script_args(pdf_options):
+    return {
+        "width": get_printable_width(pdf_options),
+        "properties": list(INLINE_PROPERTIES),
+        "classes": PAGE_NUMBER_CLASSES,
+    }
+
+
+def extract_header_footer(page, pdf_options):
+    """Move #header-html and #footer-html out of the loaded print HTML
+
+    Returns {"header": {"html", "height"} or None, "footer": ...}.
+    """
+    return page.evaluate(EXTRACT_SCRIPT, get_script_args(pdf_options))
+
+
+async def extract_header_footer_async(page, pdf_options):
+    """extract_header_footer for a page of the Playwright async API"""
+    return await page.evaluate(EXTRACT_SCRIPT, get_script_args(pdf_options))
+
+
+def apply_header_footer(pdf_options, sections, resolver=None, base_url=None):
+    """Get `pdf_options` with Chrome templates for the extracted sections
+
+    Top and bottom margins grow by the height of header and footer, which are
+    laid out inside them. Images are inlined as data URIs through `resolver`,
+    with relative URLs taken from `base_url`, as templates can't load
+    anything over the network.
+    """
+    header, footer = sections.get("header"), sections.get("footer")
+    if not (header or footer):
+        return pdf_options
+
+    pdf_options = dict(pdf_options)
+    margin = dict(pdf_options.get("margin") or {})
+    margin_left = to_inches(margin.get("left")) * 25.4
+    margin_right = to_inches(margin.get("right")) * 25.4
+
+    sides = (("header", header, "top"), ("footer", footer, "bottom"))
+    for name, section, side in sides:
+        if not section:
+            # Chrome prints its own date/title/url template for an empty one
+            pdf_options[f"{name}_template"] = "<span></span>"
+            continue
+
+        edge = to_inches(margin.get(side)) * 25.4
+        pdf_options[f"{name}_template"] = make_template(
+            section["html"], side, edge, margin_left, margin_right, resolver, base_url
+        )
+        height = section["height"] * MM_PER_PX
+        margin[side] = f"{edge + height + SECTION_SPACING_MM:.2f}mm"
+
+    pdf_options["margin"] = margin
+    pdf_options["display_header_footer"] = True
+    return pdf_options
+
+
+def make_template(
+    html, side, edge, margin_left, margin_right, resolver=None, base_url=None
+):
+    """Wrap section HTML in a template container aligned with the page content"""
+    html = DATA_WK_CLASSES_RE.sub("", html)
+    if resolver:
+        html = IMG_SRC_RE.sub(
+            lambda match: inline_image(match, resolver, base_url), html
+        )
+
+    return (
+        '<div style="width: 100%; box-sizing: border-box; '
+        "-webkit-print-color-adjust: exact; print-color-adjust: exact; "
+        f"padding-{side}: {edge:.2f}mm; "
+        f'padding-left: {margin_left:.2f}mm; padding-right: {margin_right:.2f}mm;">'
+        f"{html}</div>"
+    )
+
+
+def inline_image(match, resolver, base_url=None):
+    url = unescape(match.group(2))
+    if base_url:
+        url = urljoin(base_url, url)
+
+    try:
+        result = resolver.resolve(url)
+    except Exception:
+        result = None
+
+    if result is None or result is FORBIDDEN:
+        return match.group(0)
+
+    body, content_type = result
+    data = base64.b64encode(body).decode()
+    return f"{match.group(1)}data:{content_type};base64,{data}{match.group(3)}"
+
+
+def is_native_header_footer(print_format):
+    """Check if `print_format` renders its header/footer with Chrome templates"""
+    return bool(print_format) and get_render_profile(print_format).native_header_footer
@@ -23,11 +23,11 @@ app_license = "AGPLv3"
 # include js in page
 # Keep minimal client scripts if needed for PDF
 page_js = {
-    "print": "frappe_puppeteer_pdf/client_scripts/print.js",
+    "print": "public/js/print.js",
 }
 
 # include js in doctype views
-doctype_js = {"Print Format": "frappe_puppeteer_pdf/client_scripts/print_format.js"}
+doctype_js = {"Print Format": "public/js/print_format.js"}
 
 # Jinja
 # ----------
@@ -37,8 +37,11 @@ jinja = {
     "methods": [
         "frappe_puppeteer_pdf.pdf_utils.render_user_text",
         "frappe_puppeteer_pdf.pdf_utils.convert_css",
+        "frappe_puppeteer_pdf.pdf_utils.convert_css_class",
+        "frappe_puppeteer_pdf.pdf_utils.get_interned_styles",
         "frappe_puppeteer_pdf.pdf_utils.convert_uom",
         "frappe_puppeteer_pdf.pdf_utils.get_barcode",
+        "frappe_puppeteer_pdf.pdf_utils.get_barcodes",
     ]
 }
 
@@ -63,9 +66,15 @@ pdf_footer_html = "frappe_puppeteer_pdf.pdf_utils.pdf_header_footer_html"
 get_print_format_template = "frappe_puppeteer_pdf.pdf_utils.get_print_format_template"
 
 # Request Hooks
-before_request = ["frappe_puppeteer_pdf.pdf_generator.before_request"]
+before_request = [
+    "frappe_puppeteer_pdf.pdf_generator.before_request",
+    "frappe_puppeteer_pdf.prewarm.prewarm_chrome",
+]
 after_request = ["frappe_puppeteer_pdf.pdf_generator.after_request"]
 
+# Job Hooks
+before_job = ["frappe_puppeteer_pdf.prewarm.prewarm_chrome"]
+
 # Main PDF Generator Hook
 pdf_generator = "frappe_puppeteer_pdf.pdf_generator.get_pdf"
 
@@ -85,12 +94,24 @@ override_doctype_class = {
 scheduler_events = {
     "all": [
         "frappe_puppeteer_pdf.install.setup_chromium",
+        "frappe_puppeteer_pdf.chrome_watchdog.check_chrome_pool",
     ],
 }
 
 # Document Events
 # ---------------
 
+doc_events = {
+    "Print Format": {
+        "on_update": "frappe_puppeteer_pdf.render_profile.on_settings_change",
+        "on_trash": "frappe_puppeteer_pdf.render_profile.on_settings_change",
+        "after_rename": "frappe_puppeteer_pdf.render_profile.on_settings_change",
+    },
+    "Print Settings": {
+        "on_update": "frappe_puppeteer_pdf.render_profile.on_settings_change",
+    },
+}
+
 # Testing
 # -------
 
@@ -98,10 +119,12 @@ scheduler_events = {
 
 # Overriding Methods
 # ------------------------------
-#
-# override_whitelisted_methods = {
-#     "frappe.desk.doctype.event.event.get_events": "frappe_puppeteer_pdf.event.get_events"
-# }
+
+override_whitelisted_methods = {
+    "frappe.utils.print_format.download_pdf": (
+        "frappe_puppeteer_pdf.background_pdf.download_pdf_override"
+    ),
+}
 #
 # each overriding function accepts a `data` argument;
 # generated from the base implementation of the doctype dashboard,
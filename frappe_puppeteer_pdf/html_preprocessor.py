@@ -0,0 +1,237 @@
+import hashlib
+import re
+import time
+
+import frappe
+
+
+class Transform:
+    """A preprocessing step triggered by matches of `pattern`
+
+    Patterns of all transforms are compiled into one regex, so they must not
+    contain capturing groups. `handle` returns the replacement text and the
+    position in the HTML to continue scanning from, which lets a transform
+    consume more than its match.
+    """
+
+    name = None
+    pattern = None
+
+    def handle(self, match, html, state):
+        return match.group(0), match.end()
+
+    def finish(self, out, state):
+        """Called with the output chunks once the whole document is scanned"""
+
+
+class SkipRawText(Transform):
+    """Leave <script> and <textarea> contents untouched"""
+
+    name = "raw_text"
+    pattern = r"<script\b[^>]*>.*?</script\s*>|<textarea\b[^>]*>.*?</textarea\s*>"
+
+
+class DropComments(Transform):
+    """Drop HTML comments, keeping conditional comments"""
+
+    name = "comment"
+    pattern = r"<!--(?!\[if).*?-->"
+
+    def handle(self, match, html, state):
+        return "", match.end()
+
+
+class CollapseDuplicateStyles(Transform):
+    """Keep only the first of identical <style> blocks"""
+
+    name = "style"
+    pattern = r"<style\b[^>]*>.*?</style\s*>"
+
+    def handle(self, match, html, state):
+        seen = state.setdefault("styles", set())
+        digest = hashlib.sha1(match.group(0).encode("utf-8")).digest()
+        if digest in seen:
+            return "", match.end()
+        seen.add(digest)
+        return match.group(0), match.end()
+
+
+class CollapseDuplicateLinks(Transform):
+    """Keep only the first of identical <link> tags"""
+
+    name = "link"
+    pattern = r"<link\b[^>]*>"
+
+    def handle(self, match, html, state):
+        seen = state.setdefault("links", set())
+        tag = match.group(0)
+        if tag in seen:
+            return "", match.end()
+        seen.add(tag)
+        return tag, match.end()
+
+
+class StripPrintHide(Transform):
+    """Remove elements with the print-hide class (Print / Get PDF buttons)"""
+
+    name = "print_hide"
+    # Double quoted, single quoted or unquoted class attributes. Not
+    # print-hide-xs and the like, a bare \b would match those too.
+    pattern = (
+        r"<[a-zA-Z][\w-]*\b[^>]*\bclass\s*=\s*"
+        r"(?:\"[^\"]*(?<![\w-])print-hide(?![\w-])[^\"]*\""
+        r"|'[^']*(?<![\w-])print-hide(?![\w-])[^']*'"
+        r"|print-hide(?=[\s>]))[^>]*>"
+    )
+
+    tag_name_re = re.compile(r"<([a-zA-Z][\w-]*)")
+    void_elements = {"img", "input", "br", "hr", "meta", "link", "source", "wbr"}
+
+    def handle(self, match, html, state):
+        opening = match.group(0)
+        tag = self.tag_name_re.match(opening).group(1).lower()
+        if tag in self.void_elements or opening.endswith("/>"):
+            return "", match.end()
+
+        # Find the matching closing tag, accounting for nested elements
+        tag_re = state.get(f"tag_re:{tag}")
+        if tag_re is None:
+            tag_re = state[f"tag_re:{tag}"] = re.compile(
+                rf"<(/?){tag}\b[^>]*>", re.IGNORECASE
+            )
+        depth = 1
+        pos = match.end()
+        while depth:
+            inner = tag_re.search(html, pos)
+            if not inner:
+                # Unbalanced markup, only drop the opening tag
+                return "", match.end()
+            depth += -1 if inner.group(1) else 1
+            pos = inner.end()
+
+        return "", pos
+
+
+class InjectBodyMarker(Transform):
+    """Mark <body> of Print Designer documents with data-puppeteer-pdf"""
+
+    name = "body_marker"
+    pattern = r"<body\b|<div id=\"__print_designer\""
+
+    def handle(self, match, html, state):
+        text = match.group(0)
+        if not state.get("inject_marker"):
+            return text, match.end()
+
+        if text.startswith("<div"):
+            state["has_print_designer_root"] = True
+            return text, match.end()
+
+        if "body_marker_index" in state:
+            return text, match.end()
+
+        # Index of this chunk in the output, see finish()
+        state["body_marker_index"] = state["out_length"] + 1
+        return '<body data-puppeteer-pdf="true"', match.end()
+
+    def finish(self, out, state):
+        # Documents with a Print Designer root element don't need the marker
+        if state.get("has_print_designer_root") and "body_marker_index" in state:
+            out[state["body_marker_index"]] = "<body"
+
+
+class HTMLPreprocessor:
+    """Apply a set of transforms to print HTML in a single pass
+
+    The patterns of all transforms are combined into one precompiled regex.
+    The document is scanned once from start to end and every match is
+    handed to the transform it belongs to.
+    """
+
+    def __init__(self, transforms):
+        self.transforms = {transform.name: transform for transform in transforms}
+        self.pattern = re.compile(
+            "|".join(
+                f"(?P<{transform.name}>{transform.pattern})"
+                for transform in transforms
+            ),
+            re.IGNORECASE | re.DOTALL,
+        )
+
+    def process(self, html, **context):
+        """Get the transformed HTML and stats about the pass"""
+        started_at = time.monotonic()
+        state = dict(context)
+        counts = {}
+        out = []
+        pos = 0
+
+        while True:
+            match = self.pattern.search(html, pos)
+            if not match:
+                break
+
+            transform = self.transforms[match.lastgroup]
+            out.append(html[pos : match.start()])
+            state["out_length"] = len(out) - 1
+            replacement, pos = transform.handle(match, html, state)
+            out.append(replacement)
+            counts[transform.name] = counts.get(transform.name, 0) + 1
+
+            # Guard against transforms not consuming anything
+            if pos <= match.start():
+                pos = match.start() + 1
+                out.append(html[match.start() : pos])
+
+        out.append(html[pos:])
+
+        for transform in self.transforms.values():
+            transform.finish(out, state)
+
+        result = "".join(out)
+        stats = {
+            "bytes_in": len(html),
+            "bytes_out": len(result),
+            "bytes_saved": len(html) - len(result),
+            "time_ms": round((time.monotonic() - started_at) * 1000, 2),
+            "matches": counts,
+        }
+        return result, stats
+
+
+DEFAULT_TRANSFORMS = (
+    SkipRawText,
+    DropComments,
+    CollapseDuplicateStyles,
+    CollapseDuplicateLinks,
+    StripPrintHide,
+    InjectBodyMarker,
+)
+
+# Global preprocessor instance, patterns are compiled once per process
+_html_preprocessor = None
+
+
+def get_html_preprocessor():
+    """Get singleton preprocessor with default and hooked transforms
+
+    Apps can add transforms by listing Transform subclasses under the
+    `pdf_html_transforms` hook.
+    """
+    global _html_preprocessor
+    if _html_preprocessor is None:
+        transforms = [transform() for transform in DEFAULT_TRANSFORMS]
+        for path in frappe.get_hooks("pdf_html_transforms"):
+            transforms.append(frappe.get_attr(path)())
+        _html_preprocessor = HTMLPreprocessor(transforms)
+    return _html_preprocessor
+
+
+def preprocess_html(html, inject_marker=False):
+    """Preprocess print HTML before handing it to Chrome"""
+    html, stats = get_html_preprocessor().process(html, inject_marker=inject_marker)
+    frappe.logger().debug(
+        f"Preprocessed HTML in {stats['time_ms']} ms, "
+        f"saved {stats['bytes_saved']} bytes"
+    )
+    return html, stats
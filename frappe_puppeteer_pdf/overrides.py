@@ -7,16 +7,9 @@ class PuppeteerPrintFormat(PrintFormat):
 
     def get_html(self, doc=None, print_settings=None):
         """Get HTML for the document, ensuring puppeteer compatibility"""
-        html = super().get_html(doc, print_settings)
-
-        # If this is a print designer format using puppeteer, ensure proper HTML structure
-        if self.print_designer:
-            # Add puppeteer marker for identification
-            if '<div id="__print_designer"' not in html:
-                # Insert marker at the beginning of body
-                html = html.replace("<body", '<body data-puppeteer-pdf="true"')
-
-        return html
+        # The data-puppeteer-pdf marker for print designer formats is added by
+        # the single pass HTML preprocessor before the HTML is sent to Chrome
+        return super().get_html(doc, print_settings)
 
     def get_print_settings(self, print_settings=None):
         """Override print settings to ensure puppeteer is used for print designer formats"""
@@ -0,0 +1,7 @@
+from frappe.custom.doctype.custom_field.custom_field import create_custom_fields
+
+from ..custom_fields import CUSTOM_FIELDS
+
+
+def execute():
+    create_custom_fields(CUSTOM_FIELDS, ignore_validate=True)
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+from html import unescape
+from urllib.parse import urljoin
+
+import frappe
+from frappe.utils import cint
+
+CACHE_PREFIX = "chrome_pdf_cache"
+
+# URLs of src and href attributes and of CSS url() references
+ASSET_URL_RE = re.compile(
+    r"""\b(?:src|href)\s*=\s*["']([^"']+)["']|url\(\s*["']?([^"')]+)""",
+    re.IGNORECASE,
+)
+
+
+class PDFCache:
+    """Content-addressed cache of rendered PDFs
+
+    Entries are keyed by a hash of the final HTML, the Playwright PDF
+    options and the versions of the same-site files the HTML refers to.
+    Small PDFs are kept in Redis, larger ones on disk under the site's
+    private folder, where the least recently used files are evicted once
+    the cache grows past its size cap.
+    """
+
+    def __init__(self):
+        self.cache_dir = frappe.get_site_path("private", "pdf_cache")
+        self.max_size = cint(frappe.conf.get("chrome_pdf_cache_size_mb", 256)) << 20
+        self.redis_max_size = (
+            cint(frappe.conf.get("chrome_pdf_cache_redis_max_kb", 256)) << 10
+        )
+        self.redis_expiry = cint(
+            frappe.conf.get("chrome_pdf_cache_redis_expiry", 86400)
+        )
+
+    def make_key(self, html, pdf_options):
+        """Hash HTML, PDF options and the assets the HTML uses into a cache key"""
+        digest = hashlib.sha256(html.encode("utf-8"))
+        digest.update(
+            json.dumps(pdf_options, sort_keys=True, default=str).encode("utf-8")
+        )
+        digest.update(
+            json.dumps(get_asset_versions(html), sort_keys=True).encode("utf-8")
+        )
+        return digest.hexdigest()
+
+    def get_file_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.pdf")
+
+    def get(self, key):
+        """Get cached PDF bytes or None"""
+        data = frappe.cache().get_value(f"{CACHE_PREFIX}:{key}")
+
+        if data is None:
+            path = self.get_file_path(key)
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                # Mark as recently used for LRU eviction
+                os.utime(path)
+            except FileNotFoundError:
+                data = None
+
+        self.incr("hits" if data is not None else "misses")
+        return data
+
+    def get_to_file(self, key, output):
+        """Copy cached PDF to `output`, returns False on a miss"""
+        path = self.get_file_path(key)
+        if os.path.exists(path):
+            try:
+                shutil.copyfile(path, output)
+                os.utime(path)
+                self.incr("hits")
+                return True
+            except FileNotFoundError:
+                # Evicted by another worker in the meantime
+                pass
+
+        data = self.get(key)
+        if data is None:
+            return False
+
+        with open(output, "wb") as f:
+            f.write(data)
+        return True
+
+    def set(self, key, data):
+        """Cache PDF bytes"""
+        if len(data) <= self.redis_max_size:
+            frappe.cache().set_value(
+                f"{CACHE_PREFIX}:{key}", data, expires_in_sec=self.redis_expiry
+            )
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self.get_file_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self.evict()
+
+    def set_from_file(self, key, path):
+        """Cache the PDF at `path` without reading large files into memory"""
+        size = os.path.getsize(path)
+        if size <= self.redis_max_size:
+            with open(path, "rb") as f:
+                self.set(key, f.read())
+            return
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        cache_path = self.get_file_path(key)
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        shutil.copyfile(path, tmp_path)
+        os.replace(tmp_path, cache_path)
+
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used files until the cache fits its size cap"""
+        entries = []
+        total_size = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.name.endswith(".pdf"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+
+        if total_size <= self.max_size:
+            return
+
+        for _mtime, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+            if total_size <= self.max_size:
+                break
+
+    def clear(self):
+        frappe.cache().delete_keys(CACHE_PREFIX)
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def incr(self, counter):
+        cache = frappe.cache()
+        cache.incrby(cache.make_key(f"{CACHE_PREFIX}_stats:{counter}"), 1)
+
+    def get_stats(self):
+        """Get hit/miss counters and disk usage"""
+        cache = frappe.cache()
+        hits = cint(cache.get(cache.make_key(f"{CACHE_PREFIX}_stats:hits")))
+        misses = cint(cache.get(cache.make_key(f"{CACHE_PREFIX}_stats:misses")))
+
+        files = 0
+        disk_size = 0
+        if os.path.exists(self.cache_dir):
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".pdf"):
+                        files += 1
+                        disk_size += entry.stat().st_size
+
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0,
+            "disk_files": files,
+            "disk_size": disk_size,
+            "max_size": self.max_size,
+        }
+
+
+def get_asset_versions(html):
+    """Get the modification time and size of same-site files `html` refers to
+
+    A stylesheet, image or font replaced on disk changes the PDF without
+    changing the HTML. Missing files are versioned as None.
+    """
+    from .asset_resolver import AssetResolver
+
+    resolver = AssetResolver.for_site()
+    base_url = frappe.utils.get_url() + "/"
+    versions = {}
+    for match in ASSET_URL_RE.finditer(html):
+        url = urljoin(base_url, unescape(match.group(1) or match.group(2)).strip())
+        file_path = resolver.get_file_path(url)
+        if file_path is None or file_path in versions:
+            continue
+
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            versions[file_path] = None
+        else:
+            versions[file_path] = (stat.st_mtime_ns, stat.st_size)
+
+    return versions
+
+
+def is_pdf_cache_enabled():
+    return cint(frappe.conf.get("chrome_pdf_cache", 0))
+
+
+def get_pdf_cache():
+    """Get PDF cache for the current site"""
+    return PDFCache()
+
+
+@frappe.whitelist()
+def get_pdf_cache_stats():
+    """Get PDF cache hit/miss counters"""
+    frappe.only_for("System Manager")
+    return get_pdf_cache().get_stats()
+
+
+@frappe.whitelist(methods=["POST"])
+def clear_pdf_cache():
+    """Remove all cached PDFs"""
+    frappe.only_for("System Manager")
+    get_pdf_cache().clear()
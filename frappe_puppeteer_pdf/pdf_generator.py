@@ -1,8 +1,42 @@
+import os
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import ExitStack
+from io import BytesIO
+
 import frappe
+from frappe.utils import cint
 from frappe.utils.pdf import get_pdf as frappe_get_pdf
-from playwright.sync_api import sync_playwright
-
+from pypdf import PdfReader
+
+from .asset_resolver import (
+    AssetResolver,
+    get_asset_cache,
+    is_asset_interception_enabled,
+)
+from .async_engine import get_async_engine, is_async_engine_enabled
 from .chrome_manager import ensure_chrome_running
+from .chrome_watchdog import track_render
+from .circuit_breaker import get_circuit_breaker
+from .css_interning import intern_inline_styles
+from .header_footer import (
+    apply_header_footer,
+    extract_header_footer,
+    is_native_header_footer,
+)
+from .html_preprocessor import preprocess_html
+from .pdf_cache import get_pdf_cache, is_pdf_cache_enabled
+from .pdf_stream import (
+    PAPER_FORMATS,
+    PDFBuffer,
+    get_paper_size,
+    get_stream_chunk_size,
+    is_pdf_streaming_enabled,
+    stream_pdf,
+)
+from .render_metrics import RenderMetrics
+from .render_profile import get_render_profile
+from .render_readiness import get_render_readiness, set_content_and_wait
+from .render_session import get_render_session
 
 
 def before_request():
@@ -14,9 +48,7 @@ def before_request():
         # Get the print format being requested
         print_format = frappe.request.args.get("format")
         if print_format:
-            pdf_generator = frappe.get_cached_value(
-                "Print Format", print_format, "pdf_generator"
-            )
+            pdf_generator = get_render_profile(print_format).pdf_generator
 
             # Set pdf_generator in form_dict
             if pdf_generator == "chrome":
@@ -28,10 +60,17 @@ def before_request():
 
         # Initialize Chrome if chrome is being used
         if frappe.local.form_dict.get("pdf_generator") == "chrome":
+            breaker = get_circuit_breaker()
+            if breaker.is_open():
+                # Chrome is cooling down after repeated failures
+                frappe.local.form_dict.pdf_generator = "wkhtmltopdf"
+                return
+
             try:
                 ensure_chrome_running()
             except Exception as e:
                 frappe.log_error(f"Failed to start Chrome: {e}")
+                breaker.record_failure(e)
                 # Fallback to wkhtmltopdf
                 frappe.local.form_dict.pdf_generator = "wkhtmltopdf"
 
@@ -48,30 +87,91 @@ def get_pdf(print_format, html, options=None, output=None, pdf_generator=None):
         # Let Frappe use default PDF generator
         return None
 
+    # Frappe passes a PdfWriter as output when merging several documents
+    if output is not None and not isinstance(output, (str, os.PathLike)):
+        pdf_data = get_pdf(print_format, html, options, pdf_generator=pdf_generator)
+        output.append(PdfReader(BytesIO(pdf_data)))
+        return output
+
+    metrics = RenderMetrics(print_format)
     try:
         frappe.logger().info(
             f"Generating PDF with chrome/playwright for format: {print_format}"
         )
 
-        # Get orientation from Print Format
-        if not options:
-            options = {}
-        if print_format:
-            orientation = frappe.get_cached_value("Print Format", print_format, "pdf_page_orientation")
-            if orientation:
-                options["orientation"] = orientation
-
-        # Ensure Chrome is running
-        chrome_manager = ensure_chrome_running()
+        with metrics.stage("prepare"):
+            options = get_pdf_options(print_format, options)
+            html = prepare_html(html, print_format)
+        metrics.set_html(html)
+        header_footer = is_native_header_footer(print_format)
+
+        # Serve repeated prints of identical HTML without touching Chrome
+        pdf_cache = get_pdf_cache() if is_pdf_cache_enabled() else None
+        if pdf_cache:
+            with metrics.stage("cache"):
+                cache_key = pdf_cache.make_key(
+                    html,
+                    {
+                        **map_frappe_to_playwright(options),
+                        "native_header_footer": header_footer,
+                    },
+                )
+                if output:
+                    hit = pdf_cache.get_to_file(cache_key, output)
+                    pdf_data = output if hit else None
+                else:
+                    pdf_data = pdf_cache.get(cache_key)
+            if pdf_data is not None:
+                metrics.finish("cache", pdf_data)
+                return pdf_data
+
+        # Chrome failed repeatedly, don't wait for it to fail again
+        breaker = get_circuit_breaker()
+        if not breaker.allow_request():
+            with metrics.stage("fallback"):
+                pdf_data = fallback_to_wkhtmltopdf(html, options, output)
+            metrics.finish("circuit_open", pdf_data)
+            return pdf_data
 
-        # Generate PDF using Playwright
-        pdf_data = generate_with_playwright(html, options, chrome_manager)
+        try:
+            # Ensure Chrome is running
+            with metrics.stage("start"):
+                chrome_manager = ensure_chrome_running()
+
+            # Generate PDF using Playwright
+            from .chunked_pdf import generate_in_chunks, should_render_in_chunks
+
+            readiness, render_timeout = get_render_readiness(print_format)
+            if should_render_in_chunks(html):
+                # Keep Chrome from laying out one giant DOM
+                generate = generate_in_chunks
+            elif is_async_engine_enabled():
+                generate = generate_with_engine
+            else:
+                generate = generate_with_playwright
+            pdf_data = generate(
+                html,
+                options,
+                chrome_manager,
+                readiness=readiness,
+                render_timeout=render_timeout,
+                output=output,
+                metrics=metrics,
+                header_footer=header_footer,
+            )
+        except Exception as e:
+            breaker.record_failure(e)
+            raise
+        breaker.record_success()
 
-        if output:
-            with open(output, "wb") as f:
-                f.write(pdf_data)
-            return output
+        if pdf_cache:
+            with metrics.stage("cache"):
+                if output:
+                    pdf_cache.set_from_file(cache_key, output)
+                else:
+                    pdf_cache.set(cache_key, pdf_data)
 
+        metrics.finish("chrome", pdf_data)
         return pdf_data
 
     except Exception as e:
@@ -79,43 +179,194 @@ def get_pdf(print_format, html, options=None, output=None, pdf_generator=None):
         frappe.logger().error(f"Falling back to wkhtmltopdf: {e}")
 
         # Fallback to Frappe's default PDF generator
-        return fallback_to_wkhtmltopdf(html, options, output)
+        with metrics.stage("fallback"):
+            pdf_data = fallback_to_wkhtmltopdf(html, options, output)
+        metrics.finish("fallback", pdf_data)
+        return pdf_data
 
 
-def generate_with_playwright(html, options, chrome_manager):
-    """Generate PDF using Playwright connected to Chrome"""
-    # Strip print-hide elements (Print/Get PDF buttons)
-    import re
-    html = re.sub(r'<div class="action-banner print-hide">.*?</div>', '', html, flags=re.DOTALL)
+def get_pdf_options(print_format, options=None):
+    """Apply Print Format specific settings to Frappe PDF options"""
+    return get_render_profile(print_format).get_pdf_options(options)
 
-    with sync_playwright() as p:
-        try:
-            # Connect to running Chrome instance
-            browser = p.chromium.connect_over_cdp(chrome_manager.get_connection_url())
 
-            # Create new page
-            page = browser.new_page()
+def prepare_html(html, print_format=None):
+    """Turn rendered print HTML into the document handed to Chrome
 
-            # Set HTML content
-            page.set_content(html, wait_until="networkidle")
+    Must run on the thread that rendered the HTML, see intern_inline_styles.
+    """
+    html = intern_inline_styles(html)
 
-            # Emulate print media to apply @media print styles
-            page.emulate_media(media="print")
+    inject_marker = bool(
+        print_format and get_render_profile(print_format).print_designer
+    )
+    # Strip print-hide elements (Print/Get PDF buttons), comments and
+    # duplicate styles in a single pass
+    html, _stats = preprocess_html(html, inject_marker=inject_marker)
 
-            # Configure PDF options
-            pdf_options = map_frappe_to_playwright(options)
+    return html
 
-            # Generate PDF
-            pdf_data = page.pdf(**pdf_options)
 
-            # Cleanup
-            page.close()
-            browser.close()
+def generate_with_playwright(
+    html,
+    options,
+    chrome_manager,
+    readiness="networkidle",
+    render_timeout=30000,
+    output=None,
+    metrics=None,
+    header_footer=False,
+):
+    """Generate PDF using Playwright connected to Chrome
 
-            return pdf_data
+    Returns the PDF bytes, or `output` after the PDF was streamed into it.
+    `html` is expected to have gone through prepare_html. Stage timings are
+    added to `metrics` when given. With `header_footer`, the header-html and
+    footer-html sections are printed as Chrome header and footer templates.
+    """
+    metrics = metrics or RenderMetrics()
+    session = get_render_session()
+    try:
+        # Check out a pre-warmed, print-emulated page from the worker's pool
+        with ExitStack() as stack:
+            with metrics.stage("checkout"):
+                # Lets the watchdog recycle Chrome without breaking this render
+                stack.enter_context(track_render(chrome_manager))
+                pooled = stack.enter_context(session.checkout_page(chrome_manager))
+            page = pooled.page
+
+            # Serve the bench's own assets and files from disk
+            resolver = None
+            interception = None
+            if is_asset_interception_enabled():
+                resolver = AssetResolver.for_site()
+                interception = resolver.attach(page)
+
+            try:
+                # Set HTML content and wait until it is ready to print
+                set_content_and_wait(
+                    page, html, readiness, render_timeout, metrics=metrics
+                )
+
+                # Configure PDF options
+                pdf_options = map_frappe_to_playwright(options)
+                if header_footer:
+                    with metrics.stage("header_footer"):
+                        sections = extract_header_footer(page, pdf_options)
+                        pdf_options = apply_header_footer(
+                            pdf_options,
+                            sections,
+                            resolver or AssetResolver.for_site(),
+                            frappe.utils.get_url(),
+                        )
+
+                # Generate PDF, streaming it out of Chrome in chunks
+                with metrics.stage("pdf"):
+                    if not is_pdf_streaming_enabled():
+                        pdf_data = page.pdf(**pdf_options)
+                        if output:
+                            with open(output, "wb") as f:
+                                f.write(pdf_data)
+                            pdf_data = output
+                    elif output:
+                        with open(output, "wb") as f:
+                            stream_pdf(page, pdf_options, f)
+                        pdf_data = output
+                    else:
+                        buffer = PDFBuffer()
+                        stream_pdf(page, pdf_options, buffer)
+                        pdf_data = bytes(buffer)
+
+                if pooled.assets:
+                    metrics.set_assets(
+                        pooled.assets.get_report(resolver.resolved if resolver else 0)
+                    )
+            finally:
+                if interception:
+                    resolver.detach(interception)
+
+        return pdf_data
 
+    except Exception as e:
+        frappe.log_error(f"Playwright PDF generation error: {e}")
+        # Connection or driver may be broken, start afresh on the next render
+        if not (session.browser and session.browser.is_connected()):
+            session.reset()
+        raise
+
+
+def submit_to_engine(
+    html,
+    options,
+    chrome_manager,
+    readiness="networkidle",
+    render_timeout=30000,
+    output=None,
+    metrics=None,
+    header_footer=False,
+):
+    """Queue a render on this process's asyncio engine for `chrome_manager`
+
+    Returns a concurrent.futures.Future resolving like generate_with_playwright.
+    Needs a Frappe context, so call it from a request, job or render thread.
+    """
+    resolver = None
+    if is_asset_interception_enabled() or header_footer:
+        # The engine can't check private file permissions of the session user
+        resolver = AssetResolver.for_site(allow_private=False)
+        # Created with the site's config before the engine's executor needs it
+        get_asset_cache()
+
+    return get_async_engine(chrome_manager).submit(
+        html,
+        map_frappe_to_playwright(options),
+        readiness=readiness,
+        render_timeout=render_timeout,
+        resolver=resolver,
+        output=output,
+        chunk_size=get_stream_chunk_size() if is_pdf_streaming_enabled() else 0,
+        metrics=metrics,
+        intercept_assets=is_asset_interception_enabled(),
+        header_footer=header_footer,
+        base_url=frappe.utils.get_url(),
+    )
+
+
+def generate_with_engine(
+    html,
+    options,
+    chrome_manager,
+    readiness="networkidle",
+    render_timeout=30000,
+    output=None,
+    metrics=None,
+    header_footer=False,
+):
+    """generate_with_playwright on the asyncio engine, waiting for the result
+
+    Threads of one process share the engine's single driver and connection,
+    instead of each starting their own.
+    """
+    with track_render(chrome_manager):
+        future = submit_to_engine(
+            html,
+            options,
+            chrome_manager,
+            readiness=readiness,
+            render_timeout=render_timeout,
+            output=output,
+            metrics=metrics,
+            header_footer=header_footer,
+        )
+        timeout = cint(frappe.conf.get("chrome_async_timeout", 300))
+        try:
+            return future.result(timeout=timeout or None)
+        except FutureTimeoutError:
+            future.cancel()
+            frappe.log_error(f"Async engine render timed out after {timeout}s")
+            raise
         except Exception as e:
-            frappe.log_error(f"Playwright PDF generation error: {e}")
+            frappe.log_error(f"Async engine PDF generation error: {e}")
             raise
 
 
@@ -128,9 +379,12 @@ def map_frappe_to_playwright(options):
         "format": options.get("page_size", "A4"),
         "print_background": True,
         "scale": 1,
-        "display_header_footer": False,
-        "header_template": "",
-        "footer_template": "",
+        "display_header_footer": bool(
+            options.get("header_template") or options.get("footer_template")
+        ),
+        # Chrome prints its default date/title template for an empty one
+        "header_template": options.get("header_template") or "<span></span>",
+        "footer_template": options.get("footer_template") or "<span></span>",
         "landscape": options.get("orientation", "Portrait") == "Landscape",
         "page_ranges": options.get("page_ranges", ""),
         "margin": {
@@ -143,11 +397,18 @@ def map_frappe_to_playwright(options):
     }
 
     # Handle custom page sizes
-    if options.get("page_size") == "Custom":
+    page_size = options.get("page_size") or "A4"
+    if page_size == "Custom":
         playwright_options["width"] = f"{options.get('page_width', 210)}mm"
         playwright_options["height"] = f"{options.get('page_height', 297)}mm"
         # Remove format when using custom dimensions
         playwright_options.pop("format", None)
+    elif page_size.lower() not in PAPER_FORMATS:
+        # Print Settings sizes Playwright has no format for, unknown ones raise
+        width, height = get_paper_size(page_size)
+        playwright_options["width"] = f"{width}in"
+        playwright_options["height"] = f"{height}in"
+        playwright_options.pop("format", None)
 
     # Clean up None values
     playwright_options = {k: v for k, v in playwright_options.items() if v is not None}
@@ -169,12 +430,20 @@ def fallback_to_wkhtmltopdf(html, options, output):
 def check_chrome_status():
     """Check if Chrome is running and return status"""
     from .chrome_manager import get_chrome_manager
+    from .chrome_pool import get_chrome_pool
 
     try:
         manager = get_chrome_manager()
+        pool = get_chrome_pool().get_status()
+        breaker = get_circuit_breaker().get_state()
         if manager.is_running():
-            return {"status": "running", "port": manager.port}
+            return {
+                "status": "running",
+                "port": manager.port,
+                "pool": pool,
+                "circuit_breaker": breaker,
+            }
         else:
-            return {"status": "stopped"}
+            return {"status": "stopped", "pool": pool, "circuit_breaker": breaker}
     except Exception:
         return {"status": "error"}
@@ -0,0 +1,191 @@
+import base64
+
+import frappe
+from frappe import _
+from frappe.utils import cint
+
+# Paper sizes in inches, matching Playwright's page.pdf formats
+PAPER_FORMATS = {
+    "letter": (8.5, 11),
+    "legal": (8.5, 14),
+    "tabloid": (11, 17),
+    "ledger": (17, 11),
+    "a0": (33.1, 46.8),
+    "a1": (23.4, 33.1),
+    "a2": (16.54, 23.4),
+    "a3": (11.7, 16.54),
+    "a4": (8.27, 11.7),
+    "a5": (5.83, 8.27),
+    "a6": (4.13, 5.83),
+}
+
+# Print Settings page sizes Playwright has no format for, in millimetres
+PAGE_SIZES_MM = {
+    "a7": (74, 105),
+    "a8": (52, 74),
+    "a9": (37, 52),
+    "b0": (1000, 1414),
+    "b1": (707, 1000),
+    "b2": (500, 707),
+    "b3": (353, 500),
+    "b4": (250, 353),
+    "b5": (176, 250),
+    "b6": (125, 176),
+    "b7": (88, 125),
+    "b8": (62, 88),
+    "b9": (44, 62),
+    "b10": (31, 44),
+    "c5e": (163, 229),
+    "comm10e": (105, 241),
+    "dle": (110, 220),
+    "executive": (190.5, 254),
+    "folio": (210, 330),
+}
+
+UNITS_PER_INCH = {"px": 96, "in": 1, "cm": 2.54, "mm": 25.4}
+
+
+class PDFBuffer(bytearray):
+    """bytearray stream_pdf can write to, chunks are appended in place
+
+    Convert it with bytes() once the PDF is complete, renders return bytes.
+    """
+
+    def write(self, data):
+        self.extend(data)
+        return len(data)
+
+
+def get_paper_size(paper_format):
+    """Get (width, height) in inches of a Playwright or Print Settings format"""
+    key = str(paper_format).lower()
+    if key in PAPER_FORMATS:
+        return PAPER_FORMATS[key]
+
+    if key in PAGE_SIZES_MM:
+        width, height = PAGE_SIZES_MM[key]
+        return width / UNITS_PER_INCH["mm"], height / UNITS_PER_INCH["mm"]
+
+    frappe.throw(_("Unsupported PDF page size: {0}").format(paper_format))
+
+
+def to_inches(value):
+    """Convert a Playwright length ("10mm", "1in", 96) to inches"""
+    if value is None or value == "":
+        return 0
+
+    if isinstance(value, (int, float)):
+        return value / UNITS_PER_INCH["px"]
+
+    value = str(value).strip().lower()
+    unit = value[-2:]
+    if unit in UNITS_PER_INCH:
+        return float(value[:-2] or 0) / UNITS_PER_INCH[unit]
+
+    return float(value) / UNITS_PER_INCH["px"]
+
+
+def map_playwright_to_cdp(pdf_options):
+    """Map Playwright page.pdf options to CDP Page.printToPDF parameters"""
+    if pdf_options.get("width") or pdf_options.get("height"):
+        paper_width = to_inches(pdf_options.get("width"))
+        paper_height = to_inches(pdf_options.get("height"))
+    else:
+        paper_width, paper_height = get_paper_size(pdf_options.get("format") or "A4")
+
+    margin = pdf_options.get("margin") or {}
+
+    return {
+        "landscape": bool(pdf_options.get("landscape")),
+        "displayHeaderFooter": bool(pdf_options.get("display_header_footer")),
+        "headerTemplate": pdf_options.get("header_template") or "",
+        "footerTemplate": pdf_options.get("footer_template") or "",
+        "printBackground": bool(pdf_options.get("print_background")),
+        "scale": pdf_options.get("scale", 1),
+        "paperWidth": paper_width,
+        "paperHeight": paper_height,
+        "marginTop": to_inches(margin.get("top")),
+        "marginRight": to_inches(margin.get("right")),
+        "marginBottom": to_inches(margin.get("bottom")),
+        "marginLeft": to_inches(margin.get("left")),
+        "pageRanges": pdf_options.get("page_ranges") or "",
+        "preferCSSPageSize": bool(pdf_options.get("prefer_css_page_size")),
+        "transferMode": "ReturnAsStream",
+    }
+
+
+def stream_pdf(page, pdf_options, fileobj, chunk_size=None):
+    """Print `page` to PDF and copy it to `fileobj` chunk by chunk
+
+    Uses Page.printToPDF with transferMode ReturnAsStream so the document is
+    never held in memory as a whole, returns the number of bytes written.
+    """
+    if not chunk_size:
+        chunk_size = get_stream_chunk_size()
+
+    cdp = page.context.new_cdp_session(page)
+    try:
+        result = cdp.send("Page.printToPDF", map_playwright_to_cdp(pdf_options))
+        handle = result["stream"]
+
+        written = 0
+        try:
+            while True:
+                chunk = cdp.send("IO.read", {"handle": handle, "size": chunk_size})
+                data = chunk.get("data", "")
+                if chunk.get("base64Encoded"):
+                    data = base64.b64decode(data)
+                else:
+                    data = data.encode()
+
+                fileobj.write(data)
+                written += len(data)
+
+                if chunk.get("eof"):
+                    break
+        finally:
+            cdp.send("IO.close", {"handle": handle})
+
+        return written
+    finally:
+        cdp.detach()
+
+
+async def stream_pdf_async(page, pdf_options, fileobj, chunk_size):
+    """stream_pdf for a page of the Playwright async API"""
+    cdp = await page.context.new_cdp_session(page)
+    try:
+        result = await cdp.send("Page.printToPDF", map_playwright_to_cdp(pdf_options))
+        handle = result["stream"]
+
+        written = 0
+        try:
+            while True:
+                chunk = await cdp.send(
+                    "IO.read", {"handle": handle, "size": chunk_size}
+                )
+                data = chunk.get("data", "")
+                if chunk.get("base64Encoded"):
+                    data = base64.b64decode(data)
+                else:
+                    data = data.encode()
+
+                fileobj.write(data)
+                written += len(data)
+
+                if chunk.get("eof"):
+                    break
+        finally:
+            await cdp.send("IO.close", {"handle": handle})
+
+        return written
+    finally:
+        await cdp.detach()
+
+
+def get_stream_chunk_size():
+    return cint(frappe.conf.get("chrome_pdf_stream_chunk_kb", 1024)) << 10
+
+
+def is_pdf_streaming_enabled():
+    return cint(frappe.conf.get("chrome_stream_pdf", 1))
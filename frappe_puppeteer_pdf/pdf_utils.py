@@ -1,10 +1,19 @@
+import json
 import re
+from functools import lru_cache
 from typing import Literal
 
 import frappe
 from frappe.model.document import BaseDocument
 from frappe.utils.jinja import get_jenv
 
+from .template_cache import get_template_cache
+
+# Number of rendered barcodes and QR codes kept per process
+BARCODE_CACHE_SIZE = 4096
+
+_barcode_writer_classes = None
+
 
 @frappe.whitelist(allow_guest=False)
 def render_user_text(string, doc, row=None, send_to_jinja=None):
@@ -44,9 +53,8 @@ def render_user_text(string, doc, row=None, send_to_jinja=None):
     result = {}
     try:
         result["success"] = 1
-        result["message"] = jenv.from_string(string).render(
-            {"doc": doc, "row": row, **jinja_vars}
-        )
+        template = get_template_cache().get_template(jenv, string)
+        result["message"] = template.render({"doc": doc, "row": row, **jinja_vars})
     except Exception as e:
         """
         string is provided by user and there is no way to know if it is correct or not so log the error from client side
@@ -78,6 +86,46 @@ def render_user_text_withdoc(
     )
 
 
+@frappe.whitelist(allow_guest=False)
+def render_user_text_batch(items, doctype=None, docname=None, doc=None):
+    """Render a batch of Jinja template texts for one document
+
+    The document is loaded (or parsed) and permission checked once for the
+    whole batch. Results are returned in the order of `items`, failures are
+    reported per item.
+
+    :param items: list of dicts with `string` and optionally `row` and `send_to_jinja`
+    """
+    if isinstance(items, str):
+        items = frappe.parse_json(items)
+
+    if doctype and docname:
+        doc = frappe.get_cached_doc(doctype, docname)
+        doc.check_permission()
+    elif isinstance(doc, str):
+        doc = frappe.parse_json(doc)
+    elif not doc:
+        doc = {}
+
+    results = []
+    for item in items:
+        try:
+            result = render_user_text(
+                string=item.get("string"),
+                doc=doc,
+                row=item.get("row"),
+                send_to_jinja=item.get("send_to_jinja"),
+            )
+        except Exception as e:
+            result = {"success": 0, "error": e}
+
+        if "error" in result:
+            result["error"] = str(result["error"])
+        results.append(result)
+
+    return results
+
+
 @frappe.whitelist()
 def convert_css(css_obj):
     """Convert CSS object to string for inline styles"""
@@ -100,6 +148,20 @@ def convert_css(css_obj):
     return string_css
 
 
+def convert_css_class(css_obj):
+    """Convert CSS object to a class name shared by all elements with the same style"""
+    from .css_interning import get_style_interner
+
+    return get_style_interner().intern(convert_css(css_obj))
+
+
+def get_interned_styles():
+    """Get the <style> block for the classes returned by convert_css_class"""
+    from .css_interning import get_style_interner
+
+    return get_style_interner().get_style_block()
+
+
 @frappe.whitelist()
 def convert_uom(
     number: float,
@@ -147,8 +209,6 @@ def get_barcode(
     options = frappe.parse_json(options)
 
     if isinstance(barcode_value, str) and barcode_value.startswith("<svg"):
-        import re
-
         barcode_value = re.search(r'data-barcode-value="(.*?)">', barcode_value).group(
             1
         )
@@ -166,40 +226,43 @@ def get_barcode(
     if barcode_format == "qrcode":
         return get_qrcode(barcode_value, options, png_base64)
 
-    import base64
-    from io import BytesIO
+    barcode = get_barcode_writer_classes()[0]
+    if barcode_format not in barcode.PROVIDED_BARCODES:
+        return f"Barcode format {barcode_format} not supported. Valid formats are: {barcode.PROVIDED_BARCODES}"
 
-    import barcode
-    from barcode.writer import ImageWriter, SVGWriter
+    # Rendered barcodes are memoized, hand out copies of the cached result
+    return dict(
+        render_barcode(
+            barcode_format,
+            barcode_value,
+            json.dumps(options, sort_keys=True, default=str),
+            width,
+            height,
+            bool(png_base64),
+        )
+    )
 
-    class PDSVGWriter(SVGWriter):
-        def __init__(self):
-            SVGWriter.__init__(self)
 
-        def calculate_viewbox(self, code):
-            vw, vh = self.calculate_size(len(code[0]), len(code))
-            return vw, vh
+@frappe.whitelist()
+def get_barcodes(barcodes):
+    """Generate a list of barcodes or QR codes in one call
 
-        def _init(self, code):
-            SVGWriter._init(self, code)
-            vw, vh = self.calculate_viewbox(code)
-            if not width:
-                self._root.removeAttribute("width")
-            else:
-                self._root.setAttribute("width", f"{width * 3.7795275591}")
-            if not height:
-                self._root.removeAttribute("height")
-            else:
-                self._root.setAttribute("height", height)
+    :param barcodes: list of dicts with `barcode_format`, `barcode_value` and
+            optionally `options`, `width`, `height` and `png_base64`
+    """
+    barcodes = frappe.parse_json(barcodes)
+    return [get_barcode(**barcode) for barcode in barcodes]
 
-            self._root.setAttribute(
-                "viewBox", f"0 0 {vw * 3.7795275591} {vh * 3.7795275591}"
-            )
 
-    if barcode_format not in barcode.PROVIDED_BARCODES:
-        return f"Barcode format {barcode_format} not supported. Valid formats are: {barcode.PROVIDED_BARCODES}"
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def render_barcode(barcode_format, barcode_value, options, width, height, png_base64):
+    """Render a barcode, memoized on all of its arguments"""
+    import base64
+    from io import BytesIO
+
+    barcode, ImageWriter, PDSVGWriter = get_barcode_writer_classes()
 
-    writer = ImageWriter() if png_base64 else PDSVGWriter()
+    writer = ImageWriter() if png_base64 else PDSVGWriter(width, height)
     barcode_class = barcode.get_barcode_class(barcode_format)
 
     try:
@@ -213,23 +276,59 @@ def get_barcode(
         )
 
     stream = BytesIO()
-    barcode_obj.write(stream, options)
-    barcode_value = stream.getvalue().decode("utf-8")
+    barcode_obj.write(stream, json.loads(options))
+    barcode_value = stream.getvalue()
     stream.close()
 
     if png_base64:
-        barcode_value = base64.b64encode(barcode_value.encode()).decode()
+        barcode_value = base64.b64encode(barcode_value).decode()
+    else:
+        barcode_value = barcode_value.decode("utf-8")
 
     return {"type": "png_base64" if png_base64 else "svg", "value": barcode_value}
 
 
-def get_qrcode(barcode_value, options=None, png_base64=False):
-    """Generate QR code"""
-    import base64
-    from io import BytesIO
+def get_barcode_writer_classes():
+    """Import python-barcode and build the writer classes once per process"""
+    global _barcode_writer_classes
+    if _barcode_writer_classes is not None:
+        return _barcode_writer_classes
 
-    import pyqrcode
+    import barcode
+    from barcode.writer import ImageWriter, SVGWriter
+
+    class PDSVGWriter(SVGWriter):
+        def __init__(self, width=None, height=None):
+            SVGWriter.__init__(self)
+            self.width = width
+            self.height = height
+
+        def calculate_viewbox(self, code):
+            vw, vh = self.calculate_size(len(code[0]), len(code))
+            return vw, vh
+
+        def _init(self, code):
+            SVGWriter._init(self, code)
+            vw, vh = self.calculate_viewbox(code)
+            if not self.width:
+                self._root.removeAttribute("width")
+            else:
+                self._root.setAttribute("width", f"{self.width * 3.7795275591}")
+            if not self.height:
+                self._root.removeAttribute("height")
+            else:
+                self._root.setAttribute("height", self.height)
 
+            self._root.setAttribute(
+                "viewBox", f"0 0 {vw * 3.7795275591} {vh * 3.7795275591}"
+            )
+
+    _barcode_writer_classes = (barcode, ImageWriter, PDSVGWriter)
+    return _barcode_writer_classes
+
+
+def get_qrcode(barcode_value, options=None, png_base64=False):
+    """Generate QR code"""
     if not options:
         options = {}
 
@@ -241,6 +340,22 @@ def get_qrcode(barcode_value, options=None, png_base64=False):
         "quiet_zone": options.get("quiet_zone", 1),
     }
 
+    return dict(
+        render_qrcode(
+            barcode_value, json.dumps(options, sort_keys=True), bool(png_base64)
+        )
+    )
+
+
+@lru_cache(maxsize=BARCODE_CACHE_SIZE)
+def render_qrcode(barcode_value, options, png_base64):
+    """Render a QR code, memoized on all of its arguments"""
+    from io import BytesIO
+
+    import pyqrcode
+
+    options = json.loads(options)
+
     qr = pyqrcode.create(barcode_value)
     stream = BytesIO()
 
@@ -287,11 +402,17 @@ def pdf_header_footer_html(soup, head, content, styles, html_id, css):
 
 
 def pdf_body_html(template, args, **kwargs):
-    """Generate HTML for PDF body"""
+    """Generate HTML for PDF body
+
+    The rules of convert_css_class classes are emitted along with the body,
+    so print previews and wkhtmltopdf renders get them too.
+    """
     # Use Frappe's default implementation
     from frappe.utils.pdf import pdf_body_html as frappe_pdf_body_html
 
-    return frappe_pdf_body_html(template, args, **kwargs)
+    from .css_interning import emit_interned_styles
+
+    return emit_interned_styles(frappe_pdf_body_html(template, args, **kwargs))
 
 
 def get_print_format_template():
@@ -0,0 +1,95 @@
+import threading
+import time
+
+import frappe
+from frappe.utils import cint
+
+from .async_engine import is_async_engine_enabled
+from .chrome_manager import ensure_chrome_running
+from .circuit_breaker import get_circuit_breaker
+from .pdf_generator import generate_with_engine, generate_with_playwright
+from .render_session import close_render_session
+
+WARM_UP_HTML = """<!DOCTYPE html>
+<html>
+<head><meta charset="utf-8"><title>Warm-up</title></head>
+<body>
+<table>
+<thead><tr><th>Warm-up</th></tr></thead>
+<tbody><tr><td>1</td></tr></tbody>
+</table>
+</body>
+</html>
+"""
+
+_prewarm_lock = threading.Lock()
+# Set by the first request or job of the process, warmed up or not
+_prewarm_checked = False
+
+
+def prewarm_chrome():
+    """Warm up Chrome rendering in the background, once per process
+
+    Hooked to before_request and before_job, Frappe has no hook for worker
+    start. The first request or job of a process reads chrome_prewarm and
+    starts the warm-up without waiting for it. Every later one only checks
+    a module flag, without touching the config, Redis or a lock.
+    """
+    global _prewarm_checked
+    if _prewarm_checked:
+        return
+
+    with _prewarm_lock:
+        if _prewarm_checked:
+            return
+        _prewarm_checked = True
+
+    if not is_prewarm_enabled():
+        return
+
+    threading.Thread(
+        target=warm_up,
+        args=(frappe.local.site, frappe.local.sites_path),
+        name="chrome-pdf-prewarm",
+        daemon=True,
+    ).start()
+
+
+def warm_up(site, sites_path):
+    """Start or attach to Chrome and render a tiny document
+
+    Locating Chromium, launching it, starting Playwright and Chrome's first
+    renderer are paid here instead of by the first print. With the async
+    engine the connection itself is shared with every thread of the
+    process. Sync Playwright sessions are bound to their thread, the first
+    print of a request thread still connects, but to a running Chrome.
+    """
+    frappe.init(site=site, sites_path=sites_path)
+    frappe.connect()
+    try:
+        if get_circuit_breaker().is_open():
+            return
+
+        started_at = time.monotonic()
+        chrome_manager = ensure_chrome_running()
+        generate = generate_with_playwright
+        if is_async_engine_enabled():
+            generate = generate_with_engine
+        generate(
+            WARM_UP_HTML, {}, chrome_manager, readiness="load", render_timeout=10000
+        )
+        frappe.logger().info(
+            f"Warmed up Chrome PDF rendering in "
+            f"{(time.monotonic() - started_at) * 1000:.0f} ms"
+        )
+    except Exception as e:
+        frappe.log_error(f"Chrome warm-up failed: {e}")
+        # This thread's connection is closed right after, keep the Error Log
+        frappe.db.commit()
+    finally:
+        close_render_session()
+        frappe.destroy()
+
+
+def is_prewarm_enabled():
+    return cint(frappe.conf.get("chrome_prewarm", 0))
@@ -8,6 +8,27 @@ frappe.pages["print"].on_page_load = function (wrapper) {
 
     let print_view = new frappe.ui.form.PrintView(wrapper);
 
+    // Notify when a PDF queued for background generation is ready
+    frappe.realtime.on("chrome_pdf_ready", (data) => {
+        frappe.msgprint({
+            title: __("PDF Ready"),
+            message: __("Your PDF is ready: {0}", [
+                `<a href="${encodeURI(data.file_url)}" target="_blank">
+                    ${frappe.utils.escape_html(data.file_name)}
+                </a>`,
+            ]),
+            indicator: "green",
+        });
+    });
+
+    frappe.realtime.on("chrome_pdf_failed", (data) => {
+        frappe.msgprint({
+            title: __("PDF Generation Failed"),
+            message: frappe.utils.escape_html(data.error),
+            indicator: "red",
+        });
+    });
+
     $(wrapper).bind("show", () => {
         const route = frappe.get_route();
         const doctype = route[1];
@@ -0,0 +1,276 @@
+import json
+import os
+import re
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import cint
+from werkzeug.wrappers import Response
+
+METRICS_KEY = "chrome_pdf_metrics"
+
+# Histogram buckets, upper bounds
+SECONDS_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BYTES_BUCKETS = (16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20, 16 << 20, 64 << 20)
+PAGES_BUCKETS = (1, 2, 5, 10, 50, 100, 500, 1000)
+# The le label of a bucket sample, always its last label
+LE_LABEL_RE = re.compile(r'[{,]le="([^"]*)"\}$')
+
+METRICS = {
+    "chrome_pdf_renders_total": (
+        "counter",
+        "PDF renders by how they were served (chrome, cache, fallback, circuit_open)",
+    ),
+    "chrome_pdf_render_seconds": ("histogram", "Total time to produce a PDF"),
+    "chrome_pdf_stage_seconds": ("histogram", "Time spent in each render stage"),
+    "chrome_pdf_html_bytes": (
+        "histogram",
+        "Size of the HTML handed to Chrome in characters",
+    ),
+    "chrome_pdf_bytes": ("histogram", "Size of the generated PDF"),
+    "chrome_pdf_pages": ("histogram", "Page count of the generated PDF"),
+    "chrome_pdf_asset_requests_total": (
+        "counter",
+        "Subresource requests of renders by source "
+        "(chrome_cache, asset_resolver, network)",
+    ),
+}
+
+# Page objects of a PDF, "/Type /Pages" tree nodes excluded
+PAGE_OBJECT_RE = re.compile(rb"/Type\s*/Page(?![a-zA-Z])")
+
+
+class RenderMetrics:
+    """Timings and sizes of a single PDF render
+
+    Stages are timed with `stage()`, `finish()` adds the render to the site's
+    counters and histograms in Redis, which are shared by all workers.
+    """
+
+    def __init__(self, print_format=None):
+        self.print_format = print_format or ""
+        self.started_at = time.monotonic()
+        self.stages = {}
+        self.html_size = 0
+        self.pdf_size = 0
+        self.pages = 0
+        self.assets = {}
+
+    @contextmanager
+    def stage(self, name):
+        """Time the enclosed block as stage `name`"""
+        started_at = time.monotonic()
+        try:
+            yield
+        finally:
+            self.stages[name] = (
+                self.stages.get(name, 0) + time.monotonic() - started_at
+            )
+
+    def set_html(self, html):
+        # Characters, encoding a document of several MB only to measure it
+        # costs more than the metric is worth
+        self.html_size = len(html)
+
+    def set_assets(self, report):
+        """Record subresource requests by source, see AssetStats.get_report"""
+        self.assets = report
+
+    def set_pdf(self, pdf_data):
+        """Record size and page count of PDF bytes or a PDF file path"""
+        if isinstance(pdf_data, (str, os.PathLike)):
+            self.pdf_size = os.path.getsize(pdf_data)
+        else:
+            self.pdf_size = len(pdf_data)
+        self.pages = count_pdf_pages(pdf_data)
+
+    def finish(self, result, pdf_data=None):
+        """Record the render, `result` is how it was served, e.g. chrome"""
+        if not is_render_metrics_enabled():
+            return
+
+        duration = time.monotonic() - self.started_at
+        labels = {"print_format": self.print_format}
+
+        try:
+            if pdf_data:
+                self.set_pdf(pdf_data)
+
+            recorder = MetricsRecorder()
+            recorder.incr("chrome_pdf_renders_total", {**labels, "result": result})
+            recorder.observe("chrome_pdf_render_seconds", labels, duration)
+            for stage, seconds in self.stages.items():
+                recorder.observe(
+                    "chrome_pdf_stage_seconds", {**labels, "stage": stage}, seconds
+                )
+            if self.html_size:
+                recorder.observe("chrome_pdf_html_bytes", labels, self.html_size)
+            if self.pdf_size:
+                recorder.observe("chrome_pdf_bytes", labels, self.pdf_size)
+                recorder.observe("chrome_pdf_pages", labels, self.pages)
+            for source, count in self.assets.items():
+                if count:
+                    recorder.incr(
+                        "chrome_pdf_asset_requests_total",
+                        {**labels, "source": source},
+                        count,
+                    )
+            recorder.flush()
+        except Exception as e:
+            # Metrics must never fail a print
+            frappe.logger().warning(f"Failed to record PDF render metrics: {e}")
+
+        if cint(frappe.conf.get("chrome_pdf_metrics_log", 0)):
+            frappe.logger("frappe_puppeteer_pdf.metrics", allow_site=True).info(
+                json.dumps(
+                    {
+                        "print_format": self.print_format,
+                        "result": result,
+                        "duration_ms": round(duration * 1000, 2),
+                        "stages_ms": {
+                            stage: round(seconds * 1000, 2)
+                            for stage, seconds in self.stages.items()
+                        },
+                        "html_bytes": self.html_size,
+                        "pdf_bytes": self.pdf_size,
+                        "pages": self.pages,
+                        "assets": self.assets,
+                    }
+                )
+            )
+
+
+class MetricsRecorder:
+    """Batch metric updates into one Redis round trip
+
+    Every series is a field of one hash, named after its Prometheus sample,
+    e.g. `chrome_pdf_pages_bucket{print_format="Invoice",le="10"}`.
+    """
+
+    def __init__(self):
+        self.updates = {}
+
+    def add(self, field, value):
+        self.updates[field] = self.updates.get(field, 0) + value
+
+    def incr(self, name, labels, value=1):
+        self.add(format_sample(name, labels), value)
+
+    def observe(self, name, labels, value):
+        for bound in get_buckets(name):
+            if value <= bound:
+                self.add(format_sample(f"{name}_bucket", {**labels, "le": bound}), 1)
+        self.add(format_sample(f"{name}_bucket", {**labels, "le": "+Inf"}), 1)
+        self.add(format_sample(f"{name}_sum", labels), value)
+        self.add(format_sample(f"{name}_count", labels), 1)
+
+    def flush(self):
+        if not self.updates:
+            return
+
+        cache = frappe.cache()
+        key = cache.make_key(METRICS_KEY)
+        pipeline = cache.pipeline()
+        for field, value in self.updates.items():
+            pipeline.hincrbyfloat(key, field, value)
+        pipeline.execute()
+        self.updates = {}
+
+
+def get_buckets(name):
+    if name.endswith("_seconds"):
+        return SECONDS_BUCKETS
+    if name.endswith("_bytes"):
+        return BYTES_BUCKETS
+    return PAGES_BUCKETS
+
+
+def format_sample(name, labels):
+    """Format a sample name with labels in Prometheus text format"""
+    if not labels:
+        return name
+    pairs = ",".join(
+        f'{label}="{escape_label_value(value)}"' for label, value in labels.items()
+    )
+    return f"{name}{{{pairs}}}"
+
+
+def escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def count_pdf_pages(pdf_data, chunk_size=1 << 20):
+    """Count page objects in PDF bytes or a PDF file without parsing it"""
+    if not isinstance(pdf_data, (str, os.PathLike)):
+        return len(PAGE_OBJECT_RE.findall(pdf_data))
+
+    pages = 0
+    tail = b""
+    with open(pdf_data, "rb") as f:
+        while chunk := f.read(chunk_size):
+            data = tail + chunk
+            # Matches starting in the last bytes may continue in the next
+            # chunk, count them once the chunk is read
+            cut = max(len(data) - 32, 0)
+            pages += sum(
+                1 for match in PAGE_OBJECT_RE.finditer(data) if match.start() < cut
+            )
+            tail = data[cut:]
+    return pages + len(PAGE_OBJECT_RE.findall(tail))
+
+
+def get_metrics_text():
+    """Get all recorded metrics in Prometheus text exposition format"""
+    cache = frappe.cache()
+    # Fields are plain strings, bypass the wrapper's unpickling hgetall
+    samples = cache.execute_command("HGETALL", cache.make_key(METRICS_KEY)) or {}
+    samples = {
+        (field.decode() if isinstance(field, bytes) else field): (
+            value.decode() if isinstance(value, bytes) else value
+        )
+        for field, value in samples.items()
+    }
+
+    lines = []
+    for name, (metric_type, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for field in sorted(samples, key=get_sample_sort_key):
+            sample_name = field.split("{", 1)[0]
+            if sample_name == name or (
+                metric_type == "histogram"
+                and sample_name in (f"{name}_bucket", f"{name}_sum", f"{name}_count")
+            ):
+                lines.append(f"{field} {samples[field]}")
+
+    return "\n".join(lines) + "\n"
+
+
+def get_sample_sort_key(field):
+    """Sort samples by series, the buckets of a series by their numeric bound"""
+    match = LE_LABEL_RE.search(field)
+    if not match:
+        return field, 0
+    bound = match.group(1)
+    return field[: match.start()], float("inf") if bound == "+Inf" else float(bound)
+
+
+def is_render_metrics_enabled():
+    return cint(frappe.conf.get("chrome_pdf_metrics", 1))
+
+
+@frappe.whitelist()
+def get_render_metrics():
+    """Export PDF render metrics for Prometheus"""
+    frappe.only_for("System Manager")
+    return Response(
+        get_metrics_text(), mimetype="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@frappe.whitelist(methods=["POST"])
+def reset_render_metrics():
+    """Reset all PDF render metrics"""
+    frappe.only_for("System Manager")
+    frappe.cache().delete_value(METRICS_KEY)
@@ -0,0 +1,134 @@
+import frappe
+from frappe.utils import cint
+
+PROFILES_KEY = "chrome_render_profiles"
+VERSION_KEY = "chrome_render_profiles_version"
+
+# Print Format fields read into a profile
+PROFILE_FIELDS = (
+    "pdf_generator",
+    "pdf_page_orientation",
+    "print_designer",
+    "pdf_render_readiness",
+    "pdf_render_timeout",
+    "pdf_native_header_footer",
+)
+
+
+class RenderProfile:
+    """Chrome related settings of a Print Format and the site's Print Settings
+
+    Read from the documents once and kept per process and in Redis, so a
+    print looks them up with a dictionary access instead of one cached
+    value per setting. See get_render_profile.
+    """
+
+    def __init__(self, print_format=None, values=None):
+        values = values or {}
+        self.print_format = print_format
+        self.values = values
+        self.pdf_generator = values.get("pdf_generator") or None
+        self.orientation = values.get("pdf_page_orientation") or None
+        self.print_designer = bool(values.get("print_designer"))
+        self.readiness = values.get("pdf_render_readiness") or None
+        self.render_timeout = cint(values.get("pdf_render_timeout"))
+        self.native_header_footer = bool(values.get("pdf_native_header_footer"))
+        self.print_settings_options = values.get("print_settings_options") or {}
+
+    @classmethod
+    def build(cls, print_format=None):
+        """Read the profile of `print_format` from its documents"""
+        values = {}
+        if print_format:
+            try:
+                doc = frappe.get_cached_doc("Print Format", print_format)
+            except frappe.DoesNotExistError:
+                # Standard and other built-in formats have no document
+                frappe.clear_last_message()
+            else:
+                values = {field: doc.get(field) for field in PROFILE_FIELDS}
+
+        values["print_settings_options"] = get_print_settings_options()
+        return cls(print_format, values)
+
+    def get_pdf_options(self, options=None):
+        """Apply the format's settings to Frappe PDF options"""
+        options = options or {}
+        if self.orientation:
+            options["orientation"] = self.orientation
+        return options
+
+
+def get_print_settings_options():
+    """Get PDF page size options from Print Settings"""
+    print_settings = frappe.get_cached_doc("Print Settings")
+    options = {"page_size": print_settings.pdf_page_size or "A4"}
+
+    if options["page_size"] == "Custom":
+        options["page_width"] = print_settings.pdf_page_width
+        options["page_height"] = print_settings.pdf_page_height
+
+    return options
+
+
+# Profiles of this process by site, along with the version they were read at
+_render_profiles = {}
+
+
+def get_render_profile(print_format=None):
+    """Get the render profile of `print_format`
+
+    Profiles are dropped whenever the version stored in Redis changes. The
+    version is read once per request (Frappe keeps cache values in
+    frappe.local), every other lookup of the request is a dictionary access.
+    """
+    site = frappe.local.site
+    version = get_profiles_version()
+
+    cached_version, profiles = _render_profiles.get(site, (None, None))
+    if profiles is None or cached_version != version:
+        profiles = {}
+        _render_profiles[site] = (version, profiles)
+
+    key = print_format or ""
+    profile = profiles.get(key)
+    if profile is None:
+        cache = frappe.cache()
+        # Versioned, a profile read just before an invalidation can't
+        # end up in the hash read after it
+        profiles_key = f"{PROFILES_KEY}:{version}"
+        values = cache.hget(profiles_key, key)
+        if values is None:
+            profile = RenderProfile.build(print_format)
+            cache.hset(profiles_key, key, profile.values)
+        else:
+            profile = RenderProfile(print_format, values)
+        profiles[key] = profile
+
+    return profile
+
+
+def get_profiles_version():
+    cache = frappe.cache()
+    version = cache.get_value(VERSION_KEY)
+    if not version:
+        # Redis was flushed, make every process read its profiles afresh
+        version = frappe.generate_hash(length=10)
+        cache.set_value(VERSION_KEY, version)
+    return version
+
+
+def clear_render_profiles():
+    """Make all processes of the site read render profiles afresh"""
+    cache = frappe.cache()
+    cache.delete_value(f"{PROFILES_KEY}:{cache.get_value(VERSION_KEY)}")
+    cache.set_value(VERSION_KEY, frappe.generate_hash(length=10))
+
+
+def on_settings_change(doc, method=None, *args):
+    """Doc event of Print Format and Print Settings invalidating profiles
+
+    Invalidated after the commit, a profile read by another process before
+    then would hold the old values.
+    """
+    frappe.db.after_commit.add(clear_render_profiles)
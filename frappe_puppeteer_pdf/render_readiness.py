@@ -0,0 +1,101 @@
+import time
+
+import frappe
+from frappe.utils import cint
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+from .render_metrics import RenderMetrics
+from .render_profile import get_render_profile
+
+READINESS_MODES = ("networkidle", "load", "domcontentloaded", "js_signal", "max_wait")
+DEFAULT_READINESS = "networkidle"
+DEFAULT_TIMEOUT = 30000
+
+# Resolves once window.__pdf_ready (a promise or a truthy value) settles,
+# or after `timeout` ms. Pages that don't define it are ready right away.
+JS_SIGNAL_SCRIPT = """async (timeout) => {
+    if (window.__pdf_ready === undefined) return false;
+    await Promise.race([
+        Promise.resolve(window.__pdf_ready),
+        new Promise((resolve) => setTimeout(resolve, timeout)),
+    ]);
+    return true;
+}"""
+
+
+def get_render_readiness(print_format=None):
+    """Get (mode, timeout in ms) configured on the Print Format"""
+    profile = get_render_profile(print_format)
+    mode = profile.readiness or DEFAULT_READINESS
+    timeout = profile.render_timeout
+
+    if mode not in READINESS_MODES:
+        mode = DEFAULT_READINESS
+
+    if not timeout:
+        timeout = cint(frappe.conf.get("chrome_render_timeout", DEFAULT_TIMEOUT))
+
+    return mode, timeout
+
+
+def set_content_and_wait(
+    page, html, mode=DEFAULT_READINESS, timeout=DEFAULT_TIMEOUT, metrics=None
+):
+    """Load `html` into `page` and wait until it is ready to print
+
+    Parsing the document and waiting for it are timed as the set_content and
+    wait stages of `metrics`, both share the `timeout` budget.
+    """
+    metrics = metrics or RenderMetrics()
+    started_at = time.monotonic()
+
+    def get_remaining():
+        # Playwright treats a timeout of 0 as no timeout at all
+        return max(timeout - (time.monotonic() - started_at) * 1000, 1)
+
+    with metrics.stage("set_content"):
+        page.set_content(html, wait_until="domcontentloaded", timeout=timeout)
+
+    with metrics.stage("wait"):
+        if mode in ("networkidle", "load"):
+            page.wait_for_load_state(mode, timeout=get_remaining())
+
+        elif mode == "js_signal":
+            page.wait_for_load_state("load", timeout=get_remaining())
+            page.evaluate(JS_SIGNAL_SCRIPT, get_remaining())
+
+        elif mode == "max_wait":
+            # Wait for the network to go quiet, but print whatever is there
+            # once the budget is used up
+            try:
+                page.wait_for_load_state("networkidle", timeout=get_remaining())
+            except PlaywrightTimeoutError:
+                pass
+
+
+async def set_content_and_wait_async(
+    page, html, mode=DEFAULT_READINESS, timeout=DEFAULT_TIMEOUT, metrics=None
+):
+    """set_content_and_wait for a page of the Playwright async API"""
+    metrics = metrics or RenderMetrics()
+    started_at = time.monotonic()
+
+    def get_remaining():
+        return max(timeout - (time.monotonic() - started_at) * 1000, 1)
+
+    with metrics.stage("set_content"):
+        await page.set_content(html, wait_until="domcontentloaded", timeout=timeout)
+
+    with metrics.stage("wait"):
+        if mode in ("networkidle", "load"):
+            await page.wait_for_load_state(mode, timeout=get_remaining())
+
+        elif mode == "js_signal":
+            await page.wait_for_load_state("load", timeout=get_remaining())
+            await page.evaluate(JS_SIGNAL_SCRIPT, get_remaining())
+
+        elif mode == "max_wait":
+            try:
+                await page.wait_for_load_state("networkidle", timeout=get_remaining())
+            except PlaywrightTimeoutError:
+                pass
@@ -0,0 +1,220 @@
+import threading
+from contextlib import contextmanager
+
+import frappe
+from playwright.sync_api import sync_playwright
+
+from .render_metrics import is_render_metrics_enabled
+from .warm_cache import AssetStats
+
+# Clears storage a document left behind before a page is reused
+RESET_PAGE_SCRIPT = (
+    "() => { try { localStorage.clear(); sessionStorage.clear(); } catch (e) {} }"
+)
+
+
+class PooledPage:
+    """Page checked out from a PagePool along with its use count
+
+    `assets` counts where the current render's subresources came from, if
+    the page is tracked.
+    """
+
+    def __init__(self, page, assets=None):
+        self.page = page
+        self.uses = 0
+        self.assets = assets
+
+
+class PagePool:
+    """Bounded pool of pre-created, print-emulated pages"""
+
+    def __init__(self, browser, size=2, max_uses=50, track_assets=False):
+        self.browser = browser
+        self.size = max(int(size), 1)
+        self.max_uses = max(int(max_uses), 1)
+        self.track_assets = track_assets
+        self.idle = []
+
+    def create_page(self):
+        """Open a new page in the default context and emulate print media"""
+        # The default context shares Chrome's profile (and its disk cache)
+        context = (
+            self.browser.contexts[0]
+            if self.browser.contexts
+            else self.browser.new_context()
+        )
+        page = context.new_page()
+        page.emulate_media(media="print")
+
+        assets = None
+        if self.track_assets:
+            assets = AssetStats()
+            assets.attach(page)
+        return PooledPage(page, assets)
+
+    def warm(self, count=None):
+        """Pre-create idle pages up to `count` (defaults to the pool size)"""
+        count = min(count or self.size, self.size)
+        while len(self.idle) < count:
+            self.idle.append(self.create_page())
+
+    def acquire(self):
+        """Check out an idle page or create one if none is available"""
+        pooled = None
+        while self.idle:
+            candidate = self.idle.pop()
+            if not candidate.page.is_closed():
+                pooled = candidate
+                break
+
+        if pooled is None:
+            pooled = self.create_page()
+
+        pooled.uses += 1
+        if pooled.assets:
+            pooled.assets.reset()
+        return pooled
+
+    def release(self, pooled, discard=False):
+        """Reset and return a page to the pool, recycling it after max_uses"""
+        if discard or pooled.uses >= self.max_uses or len(self.idle) >= self.size:
+            self.close_page(pooled)
+            return
+
+        try:
+            self.reset_page(pooled.page)
+        except Exception:
+            self.close_page(pooled)
+            return
+
+        self.idle.append(pooled)
+
+    def reset_page(self, page):
+        """Clear page storage and navigate back to about:blank"""
+        page.evaluate(RESET_PAGE_SCRIPT)
+        page.goto("about:blank")
+
+    def close_page(self, pooled):
+        try:
+            pooled.page.close()
+        except Exception:
+            pass
+
+    def close(self):
+        """Close all idle pages"""
+        while self.idle:
+            self.close_page(self.idle.pop())
+
+
+class RenderSession:
+    """Long-lived Playwright driver and CDP connection to the managed Chrome
+
+    The Playwright sync API is bound to the thread that started it, so a
+    session is kept per worker thread and reused across requests.
+    """
+
+    def __init__(self):
+        self.playwright = None
+        self.browser = None
+        self.connection_url = None
+        self.chrome_pid = None
+        self.page_pool = None
+
+    def start(self):
+        """Start the Playwright driver if it is not running yet"""
+        if self.playwright is None:
+            frappe.logger().info("Starting Playwright driver")
+            self.playwright = sync_playwright().start()
+
+    def get_browser(self, chrome_manager):
+        """Get a connected Browser, reconnecting if Chrome was restarted"""
+        connection_url = chrome_manager.get_connection_url()
+        chrome_pid = chrome_manager.pid
+
+        if (
+            self.browser
+            and self.browser.is_connected()
+            and self.connection_url == connection_url
+            and self.chrome_pid == chrome_pid
+        ):
+            return self.browser
+
+        self.disconnect()
+        self.start()
+
+        frappe.logger().info(f"Connecting to Chrome over CDP: {connection_url}")
+        self.browser = self.playwright.chromium.connect_over_cdp(connection_url)
+        self.connection_url = connection_url
+        self.chrome_pid = chrome_pid
+        return self.browser
+
+    def get_page_pool(self, chrome_manager):
+        """Get the page pool for the current Browser connection"""
+        browser = self.get_browser(chrome_manager)
+        if self.page_pool is None or self.page_pool.browser is not browser:
+            self.page_pool = PagePool(
+                browser,
+                size=frappe.conf.get("chrome_page_pool_size", 2),
+                max_uses=frappe.conf.get("chrome_page_max_uses", 50),
+                track_assets=is_render_metrics_enabled(),
+            )
+        return self.page_pool
+
+    @contextmanager
+    def checkout_page(self, chrome_manager):
+        """Check out a print-emulated PooledPage, returning it afterwards"""
+        pool = self.get_page_pool(chrome_manager)
+        pooled = pool.acquire()
+        try:
+            yield pooled
+        except Exception:
+            pool.release(pooled, discard=True)
+            raise
+        else:
+            pool.release(pooled)
+
+    def disconnect(self):
+        """Drop the CDP connection, Chrome itself keeps running"""
+        if self.page_pool:
+            # Pages in the default context outlive the connection, close them
+            self.page_pool.close()
+            self.page_pool = None
+        if self.browser:
+            try:
+                self.browser.close()
+            except Exception:
+                pass
+        self.browser = None
+        self.connection_url = None
+        self.chrome_pid = None
+
+    def reset(self):
+        """Tear down the connection and the driver, next use starts afresh"""
+        self.disconnect()
+        if self.playwright:
+            try:
+                self.playwright.stop()
+            except Exception:
+                pass
+        self.playwright = None
+
+
+# Render sessions are per thread as Playwright sync objects can't cross threads
+_local = threading.local()
+
+
+def get_render_session():
+    """Get render session for the current worker thread"""
+    session = getattr(_local, "session", None)
+    if session is None:
+        session = _local.session = RenderSession()
+    return session
+
+
+def close_render_session():
+    """Close render session of the current worker thread"""
+    session = getattr(_local, "session", None)
+    if session:
+        session.reset()
+        _local.session = None
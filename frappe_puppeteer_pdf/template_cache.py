@@ -0,0 +1,73 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+import frappe
+from frappe.utils import cint
+
+
+class TemplateCache:
+    """Bounded LRU of compiled Jinja templates keyed by a hash of their source
+
+    Only the compiled code is shared across requests. Templates are bound to
+    the Jinja environment of the current request on every lookup, so request
+    specific globals (session user etc.) never leak between requests.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_template(self, jenv, source):
+        """Get a template for `source` bound to `jenv`, compiling it only once"""
+        key = hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            code = self.entries.get(key)
+            if code is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+
+        if code is None:
+            code = jenv.compile(source)
+            with self.lock:
+                self.entries[key] = code
+                while len(self.entries) > self.max_size:
+                    self.entries.popitem(last=False)
+
+        return jenv.template_class.from_code(jenv, code, jenv.make_globals(None))
+
+    def get_stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0,
+            "size": len(self.entries),
+            "max_size": self.max_size,
+        }
+
+
+# Global template cache shared by all requests of this worker
+_template_cache = None
+
+
+def get_template_cache():
+    """Get singleton template cache"""
+    global _template_cache
+    if _template_cache is None:
+        max_size = cint(frappe.conf.get("jinja_template_cache_size", 2048))
+        _template_cache = TemplateCache(max(max_size, 1))
+    return _template_cache
+
+
+@frappe.whitelist()
+def get_template_cache_stats():
+    """Get hit/miss counters of this worker's template cache"""
+    frappe.only_for("System Manager")
+    return get_template_cache().get_stats()
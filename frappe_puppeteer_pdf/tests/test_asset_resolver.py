@@ -0,0 +1,41 @@
+import os
+import tempfile
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_puppeteer_pdf.asset_resolver import AssetResolver
+
+
+class TestAssetResolver(FrappeTestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.resolver = AssetResolver(
+            {"example.com"},
+            self.tmp_dir.name,
+            os.path.join(self.tmp_dir.name, "public"),
+            os.path.join(self.tmp_dir.name, "private"),
+        )
+
+    def write(self, name, body):
+        path = os.path.join(self.tmp_dir.name, name)
+        with open(path, "wb") as f:
+            f.write(body)
+        return path
+
+    def test_replaced_file_is_served_afresh(self):
+        url = "https://example.com/assets/letterhead.svg"
+        path = self.write("letterhead.svg", b"<svg>old</svg>")
+        self.assertEqual(self.resolver.resolve(url)[0], b"<svg>old</svg>")
+
+        self.write("letterhead.svg", b"<svg>new logo</svg>")
+        # Same name, a later modification time
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        self.assertEqual(self.resolver.resolve(url)[0], b"<svg>new logo</svg>")
+
+    def test_other_hosts_are_passed_on(self):
+        self.write("site.css", b"body {}")
+        self.assertIsNone(
+            self.resolver.resolve("https://cdn.example.org/assets/site.css")
+        )
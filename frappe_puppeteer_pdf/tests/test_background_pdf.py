@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_puppeteer_pdf.background_pdf import download_pdf_override
+
+
+class TestDownloadPdfOverride(FrappeTestCase):
+    def test_request_arguments_are_not_forwarded(self):
+        calls = []
+
+        # Same fixed signature as Frappe's download_pdf
+        def download_pdf(
+            doctype,
+            name,
+            format=None,
+            doc=None,
+            no_letterhead=0,
+            language=None,
+            letterhead=None,
+        ):
+            calls.append((doctype, name, format))
+
+        with patch("frappe.utils.print_format.download_pdf", download_pdf):
+            download_pdf_override(
+                "User",
+                "Administrator",
+                "Standard",
+                cmd="frappe.utils.print_format.download_pdf",
+                _="1700000000000",
+                pdf_generator="wkhtmltopdf",
+            )
+
+        self.assertEqual(calls, [("User", "Administrator", "Standard")])
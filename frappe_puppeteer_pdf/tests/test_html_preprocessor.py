@@ -0,0 +1,23 @@
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_puppeteer_pdf.html_preprocessor import preprocess_html
+
+
+class TestStripPrintHide(FrappeTestCase):
+    def assertStripped(self, element):
+        html, _stats = preprocess_html(f"<body><p>Keep</p>{element}</body>")
+        self.assertEqual(html, "<body><p>Keep</p></body>")
+
+    def test_double_quoted_class(self):
+        self.assertStripped('<div class="btn print-hide">Print</div>')
+
+    def test_single_quoted_class(self):
+        self.assertStripped("<div class='btn print-hide'>Print</div>")
+
+    def test_unquoted_class(self):
+        self.assertStripped("<div class=print-hide>Print</div>")
+
+    def test_similar_classes_are_kept(self):
+        element = '<div class="print-hide-xs">Keep</div>'
+        html, _stats = preprocess_html(f"<body>{element}</body>")
+        self.assertIn(element, html)
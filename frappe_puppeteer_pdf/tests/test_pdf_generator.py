@@ -0,0 +1,65 @@
+from contextlib import contextmanager, nullcontext
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from frappe.tests.utils import FrappeTestCase
+
+from frappe_puppeteer_pdf import pdf_generator
+
+PDF_CHUNKS = (b"%PDF-1.4\n", b"%%EOF\n")
+
+
+def fake_stream_pdf(page, pdf_options, fileobj, chunk_size=None):
+    for chunk in PDF_CHUNKS:
+        fileobj.write(chunk)
+
+
+class FakeRenderSession:
+    browser = None
+
+    @contextmanager
+    def checkout_page(self, chrome_manager):
+        yield SimpleNamespace(page=MagicMock(), assets=None)
+
+
+class TestGetPdf(FrappeTestCase):
+    def setUp(self):
+        breaker = MagicMock()
+        breaker.allow_request.return_value = True
+
+        # Render through generate_with_playwright with Chrome stubbed out
+        replacements = {
+            "prepare_html": lambda html, print_format: html,
+            "get_pdf_options": lambda print_format, options: options or {},
+            "is_native_header_footer": lambda print_format: False,
+            "is_pdf_cache_enabled": lambda: False,
+            "get_circuit_breaker": lambda: breaker,
+            "ensure_chrome_running": MagicMock(),
+            "get_render_readiness": lambda print_format: ("load", 1000),
+            "is_async_engine_enabled": lambda: False,
+            "get_render_session": FakeRenderSession,
+            "track_render": lambda chrome_manager: nullcontext(),
+            "is_asset_interception_enabled": lambda: False,
+            "set_content_and_wait": MagicMock(),
+            "is_pdf_streaming_enabled": lambda: True,
+            "stream_pdf": fake_stream_pdf,
+        }
+        for name, value in replacements.items():
+            patcher = patch.object(pdf_generator, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        patcher = patch(
+            "frappe_puppeteer_pdf.chunked_pdf.should_render_in_chunks",
+            return_value=False,
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_streamed_pdf_is_bytes(self):
+        pdf_data = pdf_generator.get_pdf(
+            None, "<p>Test</p>", {"page_size": "A4"}, pdf_generator="chrome"
+        )
+
+        self.assertIs(type(pdf_data), bytes)
+        self.assertEqual(pdf_data, b"".join(PDF_CHUNKS))
@@ -0,0 +1,106 @@
+import json
+from html import escape
+from urllib.parse import urlparse
+
+import frappe
+
+# Loaded as Chrome's start page. Stylesheets are linked so the fonts they
+# declare can be loaded too, anything else is fetched into the HTTP cache.
+WARM_PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>PDF warm cache</title>
+{links}
+</head>
+<body>
+<script>
+{fetches}.forEach((url) => fetch(url, {{ mode: "no-cors" }}).catch(() => {{}}));
+window.addEventListener("load", () => {{
+    document.fonts.forEach((face) => face.load().catch(() => {{}}));
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def make_warm_page(urls):
+    """Get the HTML of a page loading `urls` into Chrome's cache"""
+    stylesheets = [url for url in urls if is_stylesheet_url(url)]
+    fetches = [url for url in urls if not is_stylesheet_url(url)]
+    links = "\n".join(
+        f'<link rel="stylesheet" href="{escape(url)}">' for url in stylesheets
+    )
+    # Keep a URL from closing the script element
+    return WARM_PAGE.format(
+        links=links, fetches=json.dumps(fetches).replace("</", "<\\/")
+    )
+
+
+def is_stylesheet_url(url):
+    parsed = urlparse(url)
+    return parsed.path.endswith(".css") or parsed.netloc == "fonts.googleapis.com"
+
+
+def get_warm_urls():
+    """Get the absolute URLs to preload into every pool instance"""
+    urls = frappe.get_common_site_config().get("chrome_warm_urls") or []
+    return [url for url in urls if urlparse(url).scheme in ("http", "https")]
+
+
+class AssetStats:
+    """Where the subresources of a page's current render came from
+
+    Counted from the CDP Network events of the page. Responses fulfilled by
+    the asset resolver are counted by the resolver, they show up as neither
+    cached nor fetched here.
+    """
+
+    def __init__(self):
+        self.served_from_cache = set()
+        self.requests = 0
+        self.cached = 0
+
+    def reset(self):
+        self.served_from_cache.clear()
+        self.requests = 0
+        self.cached = 0
+
+    def attach(self, page):
+        """Start counting the responses of a Playwright sync API page"""
+        session = page.context.new_cdp_session(page)
+        session.on("Network.requestServedFromCache", self.on_served_from_cache)
+        session.on("Network.responseReceived", self.on_response_received)
+        session.send("Network.enable")
+
+    async def attach_async(self, page):
+        """attach for a page of the Playwright async API"""
+        session = await page.context.new_cdp_session(page)
+        session.on("Network.requestServedFromCache", self.on_served_from_cache)
+        session.on("Network.responseReceived", self.on_response_received)
+        await session.send("Network.enable")
+
+    def on_served_from_cache(self, params):
+        # Memory cache hits, sent before their responseReceived
+        self.served_from_cache.add(params["requestId"])
+
+    def on_response_received(self, params):
+        response = params["response"]
+        if not response["url"].startswith(("http:", "https:")):
+            return
+
+        self.requests += 1
+        if (
+            response.get("fromDiskCache")
+            or params["requestId"] in self.served_from_cache
+        ):
+            self.cached += 1
+
+    def get_report(self, resolved=0):
+        """Get request counts by source, `resolved` by the asset resolver"""
+        return {
+            "chrome_cache": self.cached,
+            "asset_resolver": resolved,
+            "network": max(self.requests - self.cached - resolved, 0),
+        }
@@ -19,5 +19,8 @@ setuptools.setup(
         "pypng~=0.20220715.0",
         "python-barcode~=0.15.1",
         "distro",
+        "psutil>=5.9",
+        "pypdf>=3.9",
+        "requests>=2.28",
     ],
 )